@@ -5,20 +5,23 @@ from typing import List, Optional
 import uvicorn
 from deep_lake_vectordb import query_vector_search
 from test_snova import summarize_text
+from http_client import http_client_lifespan
 import json
 import re
-app = FastAPI()
+app = FastAPI(lifespan=http_client_lifespan)
 from dotenv import load_dotenv
 load_dotenv()   
 class QueryRequest(BaseModel):
     user_query: str
+    # Restrict retrieval to one product's reviews
+    product_name: Optional[str] = None
 
 @app.post("/endpoint")
 async def search_query(query: QueryRequest):
     try:
         # Query the model once
         # print(query.user_query)
-        result = query_vector_search(query.user_query)
+        result = query_vector_search(query.user_query, product_name=query.product_name)
         
         # Process results
         relevant_reviews = " "
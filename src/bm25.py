@@ -0,0 +1,69 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Small stopword list; enough to keep filler words from dominating short queries
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'do', 'does', 'for',
+    'from', 'has', 'have', 'how', 'i', 'in', 'is', 'it', 'its', 'of', 'on', 'or',
+    'so', 'that', 'the', 'this', 'to', 'um', 'uh', 'was', 'what', 'when', 'where',
+    'which', 'who', 'why', 'with', 'you', 'your',
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics and drop stopwords"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index that can grow in place"""
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.num_docs = 0
+        self.doc_lengths = []
+        self.total_length = 0
+        # term -> list of (doc_id, term_frequency)
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.add(documents)
+
+    @property
+    def avg_doc_length(self) -> float:
+        return (self.total_length / self.num_docs) if self.num_docs else 0.0
+
+    def add(self, documents: List[str]):
+        """Index more documents; their ids continue from the current count"""
+        for doc in documents:
+            tokens = tokenize(doc)
+            for term, tf in Counter(tokens).items():
+                self.postings[term].append((self.num_docs, tf))
+            self.doc_lengths.append(len(tokens))
+            self.total_length += len(tokens)
+            self.num_docs += 1
+
+    def idf(self, term: str) -> float:
+        docs = len(self.postings.get(term, ()))
+        return math.log(1 + (self.num_docs - docs + 0.5) / (docs + 0.5))
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """Return BM25 scores for every document sharing a term with the query"""
+        scores: Dict[int, float] = defaultdict(float)
+        avg_len = self.avg_doc_length or 1.0
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_len)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def top_k(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Return the k best (doc_id, score) pairs, highest first"""
+        return sorted(self.scores(query).items(), key=lambda item: item[1], reverse=True)[:k]
@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from text_utils import normalize_query
+
+ANALYSIS_DIR = "analysis_results"
+
+
+def new_record_id() -> str:
+    """Time-ordered, collision-free ID, also used in result filenames"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{uuid.uuid4().hex[:12]}"
+
+
+class AnalysisCatalog:
+    """
+    SQLite index of saved analysis and Gemini result files.
+
+    Every saved result is recorded with its kind ('analysis' or 'gemini'),
+    product name and file path, so latest / by-product / time-range lookups
+    are index seeks instead of directory scans. An empty catalog is
+    backfilled once from the JSON files already in the results directory.
+    """
+
+    def __init__(self, path: str, results_dir: str = ANALYSIS_DIR):
+        self.path = path
+        self.results_dir = results_dir
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " product_name TEXT,"
+            " norm_product TEXT,"
+            " created_at REAL NOT NULL,"
+            " path TEXT NOT NULL UNIQUE)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analyses_kind_created ON analyses (kind, created_at)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS analyses_product_created ON analyses (norm_product, kind, created_at)"
+        )
+        self._conn.commit()
+
+        if len(self) == 0:
+            self.backfill()
+
+    def record(self, kind: str, product_name: Optional[str], path: str,
+               record_id: Optional[str] = None, created_at: Optional[float] = None) -> str:
+        """Add a saved result to the catalog and return its ID"""
+        record_id = record_id or new_record_id()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (id, kind, product_name, norm_product, created_at, path)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (record_id, kind, product_name, normalize_query(product_name) if product_name else None,
+                 created_at or time.time(), path)
+            )
+            self._conn.commit()
+        return record_id
+
+    def _query(self, where: str, params: tuple, limit: Optional[int]) -> List[dict]:
+        sql = f"SELECT * FROM analyses WHERE {where} ORDER BY created_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = params + (limit,)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def latest(self, kind: str = "analysis") -> Optional[dict]:
+        rows = self._query("kind = ?", (kind,), 1)
+        return rows[0] if rows else None
+
+    def by_product(self, product_name: str, kind: str = "analysis", limit: Optional[int] = 50) -> List[dict]:
+        """Entries for a product (matched on its normalized name), newest first"""
+        return self._query("norm_product = ? AND kind = ?", (normalize_query(product_name), kind), limit)
+
+    def between(self, start: float, end: float, kind: str = "analysis", limit: Optional[int] = 1000) -> List[dict]:
+        """Entries created in [start, end) as Unix timestamps, newest first"""
+        return self._query("kind = ? AND created_at >= ? AND created_at < ?", (kind, start, end), limit)
+
+    @staticmethod
+    def load(entry: dict) -> Optional[dict]:
+        """Read the JSON file a catalog entry points to"""
+        try:
+            with open(entry['path'], 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading {entry['path']}: {str(e)}")
+            return None
+
+    def backfill(self) -> int:
+        """Record JSON files in the results directory that are not in the catalog yet"""
+        if not os.path.exists(self.results_dir):
+            return 0
+        count = 0
+        for filename in os.listdir(self.results_dir):
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(self.results_dir, filename)
+            with self._lock:
+                known = self._conn.execute("SELECT 1 FROM analyses WHERE path = ?", (path,)).fetchone()
+            if known:
+                continue
+            kind = "gemini" if filename.startswith("gemini_") else "analysis"
+            data = self.load({'path': path}) or {}
+            product_name = data.get('product_name') if isinstance(data, dict) else None
+            self.record(kind, product_name, path, created_at=os.path.getctime(path))
+            count += 1
+        if count:
+            print(f"Catalog backfilled with {count} existing results")
+        return count
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+
+analysis_catalog = AnalysisCatalog(os.getenv('ANALYSIS_CATALOG_PATH', os.path.join(ANALYSIS_DIR, 'catalog.db')))
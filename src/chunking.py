@@ -0,0 +1,78 @@
+import re
+from typing import List
+
+from text_utils import estimate_tokens
+
+# Sentence ends (., ! or ? followed by whitespace) and paragraph breaks
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text) if sentence and sentence.strip()]
+
+
+def _split_long(sentence: str, max_tokens: int) -> List[str]:
+    """Split a sentence over the budget at word boundaries"""
+    pieces = []
+    current = []
+    current_tokens = 0
+    for word in sentence.split():
+        tokens = estimate_tokens(word + " ")
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(word)
+        current_tokens += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int = 256, overlap_tokens: int = 32) -> List[str]:
+    """
+    Split text into chunks of whole sentences within a token budget
+
+    Consecutive chunks share up to `overlap_tokens` of trailing sentences so
+    a statement spanning a boundary is retrievable from either side. A
+    sentence longer than the budget is split at word boundaries.
+
+    Args:
+        text (str): Text to split
+        max_tokens (int): Estimated token budget per chunk
+        overlap_tokens (int): Estimated tokens repeated from the end of the previous chunk
+
+    Returns:
+        List[str]: Chunks in document order
+    """
+    sentences = []
+    for sentence in split_sentences(text):
+        if estimate_tokens(sentence) > max_tokens:
+            sentences += _split_long(sentence, max_tokens)
+        else:
+            sentences.append(sentence)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for sentence in sentences:
+        tokens = estimate_tokens(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            # Carry trailing sentences into the next chunk as overlap
+            overlap = []
+            overlap_total = 0
+            for previous in reversed(current):
+                previous_tokens = estimate_tokens(previous)
+                if overlap_total + previous_tokens > overlap_tokens or \
+                        overlap_total + previous_tokens + tokens > max_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_total += previous_tokens
+            current = overlap
+            current_tokens = overlap_total
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
@@ -1,68 +1,397 @@
-import deeplake
-from deeplake import types
+try:
+    import deeplake
+    from deeplake import types
+except ImportError:
+    # Only the Deep Lake backend needs it; the local vector store runs without
+    deeplake = None
 import openai
 import numpy as np
 import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from chunking import chunk_text
+from embedding_cache import EmbeddingCache
+from text_utils import collapse_whitespace, estimate_tokens, normalize_query
+from vector_store import HYBRID_CANDIDATE_FACTOR, VectorStore, get_vector_store, reciprocal_rank_fusion
 load_dotenv()
 # Define dataset path (store locally or in the cloud)
+DEEPLAKE_DATASET = os.getenv('DEEPLAKE_DATASET', 'al://baladhurgesh97/review_db_final')
+EMBEDDING_DIM = 1536
+# Ingested rows are committed together once this many are pending, or after this many seconds
+GROUP_COMMIT_ROWS = int(os.getenv('GROUP_COMMIT_ROWS', '1000'))
+GROUP_COMMIT_DELAY = float(os.getenv('GROUP_COMMIT_DELAY', '5'))
+# Failed commits of a row are retried this many times before it is dead-lettered
+GROUP_COMMIT_MAX_RETRIES = int(os.getenv('GROUP_COMMIT_MAX_RETRIES', '3'))
+# Errors caused by the rows themselves (bad embedding, schema mismatch); retrying cannot fix them
+DATA_ERRORS = (ValueError, TypeError, KeyError)
+if deeplake is not None:
+    DATA_ERRORS += tuple(
+        getattr(deeplake, name) for name in (
+            "EmbeddingSizeMismatch", "InvalidColumnValueError", "UnevenColumnsError",
+            "ColumnMissingAppendValueError", "ColumnDoesNotExistError",
+        ) if hasattr(deeplake, name)
+    )
 
 import openai
 openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# Per-request limits of the embeddings API (2048 inputs, ~300k tokens), with headroom
+EMBEDDING_MAX_BATCH = 2048
+EMBEDDING_MAX_BATCH_TOKENS = 250000
+EMBEDDING_CONCURRENCY = int(os.getenv('EMBEDDING_CONCURRENCY', '4'))
+CHUNK_TOKENS = int(os.getenv('CHUNK_TOKENS', '256'))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '32'))
+# Fuse BM25 and vector rankings in query_vector_search unless disabled
+HYBRID_RETRIEVAL = os.getenv('HYBRID_RETRIEVAL', 'true').lower() not in ('0', 'false', 'no')
+
+# Embeddings of previously seen chunks and queries; set EMBEDDING_CACHE_DIR empty to disable
+EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', 'embedding_cache')
+embedding_cache = EmbeddingCache(
+    EMBEDDING_CACHE_DIR,
+    max_entries=int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '100000'))
+) if EMBEDDING_CACHE_DIR else None
+
+
+def _pack_batches(texts):
+    """Group texts into as few requests as the per-request limits allow"""
+    batches = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= EMBEDDING_MAX_BATCH or current_tokens + tokens > EMBEDDING_MAX_BATCH_TOKENS):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
 def embedding_function(texts, model="text-embedding-3-small"):
     if isinstance(texts, str):
         texts = [texts]
 
     texts = [t.replace("\n", " ") for t in texts]
-    return [data.embedding for data in openai.embeddings.create(input = texts, model=model).data]
+    embeddings = embedding_cache.get_many(model, texts) if embedding_cache else [None] * len(texts)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if not missing:
+        return embeddings
 
-def create_embeddings(review, product_name):
-    # Create embeddings
-    batch_size = 50
-    embeddings_review = []
-    reviews = []
-    for i in range(0, len(review), batch_size):
-        print(review[i : i + batch_size])
-        embeddings_review += embedding_function(review[i : i + batch_size])
-
-        reviews += [review[i : i + batch_size]]
-
-        print("Yay")
-    print(reviews)
-    org_id = "baladhurgesh97"
-    dataset_name_vs = "review_db_final"
-    vector_search = deeplake.create(f"al://{org_id}/{dataset_name_vs}")
+    def embed_batch(batch):
+        return [data.embedding for data in openai.embeddings.create(input = batch, model=model).data]
+
+    batches = _pack_batches([texts[i] for i in missing])
+    if len(batches) == 1:
+        fetched = embed_batch(batches[0])
+    else:
+        # Large documents span several requests; send them concurrently
+        with ThreadPoolExecutor(max_workers=min(EMBEDDING_CONCURRENCY, len(batches))) as executor:
+            fetched = [embedding for batch in executor.map(embed_batch, batches) for embedding in batch]
+
+    for i, embedding in zip(missing, fetched):
+        embeddings[i] = embedding
+    if embedding_cache:
+        embedding_cache.put_many(model, [texts[i] for i in missing], fetched)
+    return embeddings
+
+def chunk_hash(text):
+    return hashlib.sha1(collapse_whitespace(text).encode('utf-8')).hexdigest()
+
+
+def open_or_create_dataset(url=DEEPLAKE_DATASET):
+    """Open the review dataset, creating it with its columns on first use"""
+    if deeplake.exists(url):
+        dataset = deeplake.open(url)
+        # Datasets created before idempotent ingestion lack the chunk hash column
+        columns = [column.name for column in dataset.schema.columns]
+        if "chunk_hash" not in columns:
+            dataset.add_column(name="chunk_hash", dtype=types.Text())
+            dataset.commit()
+        # ...and the normalized product key that upserts and filters match on
+        if "product_key" not in columns:
+            dataset.add_column(name="product_key", dtype=types.Text(index_type=types.Inverted))
+            if len(dataset):
+                dataset["product_key"][0:len(dataset)] = [
+                    normalize_query(name) for name in dataset["product_name"][:]
+                ]
+            dataset.commit()
+        return dataset
+
+    dataset = deeplake.create(url)
     # Add columns to the dataset
-    vector_search.add_column(name="embedding", dtype=types.Embedding(1536))
-    vector_search.add_column(name="product_name", dtype=types.Text(index_type=types.BM25))
-    vector_search.add_column(name="review_context", dtype=types.Text(index_type=types.BM25))
-    for i in range(len(embeddings_review)):
-        # print(embeddings_review[i])
-        
-        vector_search.append({"embedding": np.array(embeddings_review[i]).reshape(1, -1), "product_name": [product_name], "review_context": [reviews[i]]})
-    vector_search.commit()
-    print("Text data successfully ingested into Deep Lake!")
-
-def query_vector_search(query):
-    query = "How many stars does this product have?"
-    
-    embed_query = embedding_function(query)[0]
-    embedding_string = ",".join(str(c) for c in embed_query)
-    org_id = "baladhurgesh97"
-    dataset_name_vs = "review_db_final"
-    vector_search = deeplake.open(f"al://{org_id}/{dataset_name_vs}")
-    tql_vs = f"""
-    SELECT *, cosine_similarity(embedding, ARRAY[{embedding_string}]) as score
-    FROM (
-        SELECT *, ROW_NUMBER() AS row_id
-    )
-    ORDER BY cosine_similarity(embedding, ARRAY[{embedding_string}]) DESC 
-    LIMIT 5
+    dataset.add_column(name="embedding", dtype=types.Embedding(EMBEDDING_DIM))
+    dataset.add_column(name="product_name", dtype=types.Text(index_type=types.BM25))
+    dataset.add_column(name="review_context", dtype=types.Text(index_type=types.BM25))
+    dataset.add_column(name="chunk_hash", dtype=types.Text())
+    dataset.add_column(name="product_key", dtype=types.Text(index_type=types.Inverted))
+    dataset.commit()
+    return dataset
+
+
+class GroupCommitWriter:
+    """
+    Buffered, idempotent writer for the review dataset.
+
+    Rows are keyed by (normalized product name, chunk_hash); keys already in the dataset
+    or waiting in the buffer are skipped, so re-ingesting a summary adds
+    nothing. Buffered rows are appended column-wise in a single call and
+    committed together once `max_rows` are pending or `max_delay` seconds
+    after the first pending row, amortizing commit cost across ingests.
+
+    A batch that fails with a data error is retried row by row so one bad
+    row cannot block the rest; other failures are retried up to
+    `max_retries` times. Rows that still fail go to `dead_letter` and their
+    keys are forgotten, so a later ingest can add them again.
+    """
+
+    def __init__(self, url=DEEPLAKE_DATASET, max_rows=GROUP_COMMIT_ROWS, max_delay=GROUP_COMMIT_DELAY,
+                 max_retries=GROUP_COMMIT_MAX_RETRIES):
+        self.url = url
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.dead_letter = []
+        self._dataset = None
+        self._keys = None
+        self._pending = []
+        self._timer = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _open(self):
+        if self._dataset is None:
+            self._dataset = open_or_create_dataset(self.url)
+            # Existing keys are loaded once so upserts need no query per chunk
+            products = self._dataset["product_key"][:]
+            hashes = self._dataset["chunk_hash"][:]
+            self._keys = set(zip(products, hashes))
+        return self._dataset
+
+    def dataset(self):
+        """The opened dataset, created on first use"""
+        with self._lock:
+            return self._open()
+
+    def missing(self, product_name, hashes):
+        """Indexes of the hashes not yet stored or pending for this product"""
+        with self._lock:
+            self._open()
+            product_key = normalize_query(product_name)
+            return [i for i, h in enumerate(hashes) if (product_key, h) not in self._keys]
+
+    def write(self, product_name, texts, hashes, embeddings):
+        """Queue rows for the next group commit; returns the number of new rows"""
+        with self._lock:
+            self._open()
+            product_key = normalize_query(product_name)
+            added = 0
+            for text, h, embedding in zip(texts, hashes, embeddings):
+                if (product_key, h) in self._keys:
+                    continue
+                if len(embedding) != EMBEDDING_DIM:
+                    print(f"Skipping chunk {h}: expected a {EMBEDDING_DIM}-dimensional embedding, got {len(embedding)}")
+                    continue
+                self._keys.add((product_key, h))
+                # The last field counts failed commit attempts
+                self._pending.append((product_name, text, h, embedding, product_key, 0))
+                added += 1
+            flush_now = len(self._pending) >= self.max_rows
+            if not flush_now:
+                self._arm_timer()
+        if flush_now:
+            self.flush()
+        return added
+
+    def _arm_timer(self):
+        """Schedule a flush of the pending rows; caller holds _lock"""
+        if self._pending and self._timer is None:
+            self._timer = threading.Timer(self.max_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _commit(self, rows):
+        """Append rows in one columnar batch and commit, undoing a partial append on failure"""
+        try:
+            self._dataset.append({
+                "embedding": np.asarray([row[3] for row in rows], dtype=np.float32),
+                "product_name": [row[0] for row in rows],
+                "review_context": [row[1] for row in rows],
+                "chunk_hash": [row[2] for row in rows],
+                "product_key": [row[4] for row in rows],
+            })
+            self._dataset.commit()
+        except Exception:
+            try:
+                self._dataset.rollback()
+            except Exception:
+                pass
+            raise
+
+    def _dead_letter(self, rows, error):
+        """Give up on rows; caller holds _lock"""
+        self.dead_letter.extend((row[:5], str(error)) for row in rows)
+        self._keys.difference_update((row[4], row[2]) for row in rows)
+        print(f"Dropped {len(rows)} chunks after failed commits: {str(error)}")
+
+    def flush(self):
+        """Append all pending rows in one columnar batch and commit"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not pending:
+                return
+            try:
+                self._commit(pending)
+                print(f"Committed {len(pending)} chunks to Deep Lake")
+                return
+            except DATA_ERRORS as e:
+                print(f"Error committing {len(pending)} chunks to Deep Lake, retrying one by one: {str(e)}")
+                failed = []
+                for row in pending:
+                    try:
+                        self._commit([row])
+                    except Exception as row_error:
+                        failed.append((row, row_error))
+                with self._lock:
+                    for row, row_error in failed:
+                        self._dead_letter([row], row_error)
+                print(f"Committed {len(pending) - len(failed)} chunks to Deep Lake")
+            except Exception as e:
+                # Likely transient (network, storage): requeue ahead of newer
+                # rows and retry after the delay, up to max_retries times
+                retry = [row[:5] + (row[5] + 1,) for row in pending]
+                with self._lock:
+                    exhausted = [row for row in retry if row[5] > self.max_retries]
+                    if exhausted:
+                        self._dead_letter(exhausted, e)
+                    self._pending = [row for row in retry if row[5] <= self.max_retries] + self._pending
+                    self._arm_timer()
+                print(f"Error committing {len(pending)} chunks to Deep Lake: {str(e)}")
+
+
+class DeepLakeVectorStore(VectorStore):
+    """Vector store backed by the Deep Lake review dataset, written through GroupCommitWriter"""
+
+    def __init__(self, url=DEEPLAKE_DATASET):
+        if deeplake is None:
+            raise ImportError("deeplake is required for VECTOR_STORE_BACKEND=deeplake")
+        self.writer = GroupCommitWriter(url)
+
+    def missing(self, product_name, hashes):
+        return self.writer.missing(product_name, hashes)
+
+    def add(self, product_name, texts, hashes, embeddings):
+        return self.writer.write(product_name, texts, hashes, embeddings)
+
+    def flush(self):
+        self.writer.flush()
+
+    def _query(self, order_by, k, product_name=None, params=()):
+        """
+        Run a top-k TQL query, optionally on one product's rows
+
+        User-supplied values never go into the TQL text: `order_by` refers to
+        them with `?` placeholders bound from `params`, and the product key
+        is bound the same way.
+        """
+        params = list(params)
+        where = ""
+        if product_name is not None:
+            where = "WHERE product_key = ?"
+            params.append(normalize_query(product_name))
+        tql_vs = f"""
+    SELECT *
+    {where}
+    ORDER BY {order_by} DESC
+    LIMIT {int(k)}
 """
-    
-    vs_results = vector_search.query(tql_vs)
-    print(vs_results)
-    print(vs_results["review_context"])
+        return self.writer.dataset().prepare_query(tql_vs).run_batch([params])[0]
+
+    def _rows(self, vs_results, embedding):
+        """Result rows with cosine scores computed from the returned vectors"""
+        vectors = np.asarray(vs_results["embedding"][:], dtype=np.float32).reshape(len(vs_results), -1)
+        query = np.asarray(embedding, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = vectors @ query / np.where(norms == 0, 1.0, norms)
+        return [{
+            'product_name': product,
+            'review_context': context,
+            'chunk_hash': h,
+            'score': float(score),
+        } for product, context, h, score in zip(vs_results["product_name"][:], vs_results["review_context"][:],
+                                                vs_results["chunk_hash"][:], scores)]
+
+    def search(self, embedding, k=5, product_name=None):
+        # The query vector is rendered into TQL once (floats only, nothing
+        # user-typed); scores are computed from the returned vectors
+        embedding_string = ",".join(str(float(c)) for c in embedding)
+        vs_results = self._query(f"cosine_similarity(embedding, ARRAY[{embedding_string}])", k, product_name)
+        return self._rows(vs_results, embedding)
+
+    def hybrid_search(self, query, embedding, k=5, product_name=None):
+        candidates = k * HYBRID_CANDIDATE_FACTOR
+        vector_rows = self.search(embedding, candidates, product_name)
+        # Lexical ranking from the dataset's BM25 index on review_context
+        lexical_rows = self._rows(
+            self._query("BM25_SIMILARITY(review_context, ?)", candidates, product_name, params=[query]),
+            embedding
+        )
+
+        # Legacy rows have no chunk hash, so rows are matched on their text
+        rows = {}
+        for row in vector_rows + lexical_rows:
+            rows.setdefault((row['product_name'], row['review_context']), row)
+        fused = reciprocal_rank_fusion([
+            [(row['product_name'], row['review_context']) for row in vector_rows],
+            [(row['product_name'], row['review_context']) for row in lexical_rows],
+        ])[:k]
+        return [{**rows[key], 'score': score} for key, score in fused]
+
+
+def create_embeddings(review, product_name):
+    store = get_vector_store()
+    # Sentence-aware chunks within a token budget, embedded in as few requests as possible
+    reviews = chunk_text(review, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS)
+    hashes = [chunk_hash(text) for text in reviews]
+    # Chunks already stored for this product are neither embedded nor written again
+    new = store.missing(product_name, hashes)
+    if not new:
+        print(f"No new chunks for {product_name}")
+        return 0
+    reviews = [reviews[i] for i in new]
+    hashes = [hashes[i] for i in new]
+    embeddings_review = embedding_function(reviews)
+    added = store.add(product_name, reviews, hashes, embeddings_review)
+    print(f"Stored {added} chunks for {product_name}")
+    return added
+
+def query_vector_search(query, k=5, product_name=None, hybrid=HYBRID_RETRIEVAL):
+    """
+    Return the k review chunks most relevant to the query
+
+    Args:
+        query (str): Question to match against stored reviews
+        k (int): Number of chunks to return
+        product_name (str, optional): Only score this product's chunks
+        hybrid (bool): Fuse BM25 and vector rankings instead of vector similarity alone
+
+    Returns:
+        list: Dicts with 'product_name', 'review_context', 'chunk_hash' and 'score', best first
+    """
+    embed_query = embedding_function(query)[0]
+    store = get_vector_store()
+    if hybrid:
+        vs_results = store.hybrid_search(query, embed_query, k=k, product_name=product_name)
+    else:
+        vs_results = store.search(embed_query, k=k, product_name=product_name)
     for row in vs_results:
         print(row["review_context"])
     return vs_results
@@ -80,5 +409,6 @@ if __name__ == "__main__":
     
     review= "The AuraGlow Sleep Mask is a reliable option for minimizing light disruption during sleep. Its contoured design, particularly around the nose bridge, effectively reduces ambient light, even in brighter environments. The adjustable strap ensures a comfortable and secure fit, accommodating various head sizes without slippage.  The mask is made from a soft modal blend, which breathes well and prevents overheating—a common complaint with some sleep masks.  The stitching appears durable, and after several weeks of use, there are no signs of wear. While it doesn't offer noise cancellation, its light-blocking and comfort make it a worthwhile choice for improving sleep quality. 4/5 stars."
     create_embeddings(review, product_name="AuraGlow Sleep Mask")
+    get_vector_store().flush()
     query_vector_search("How many stars does this product have?")
 
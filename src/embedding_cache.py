@@ -0,0 +1,152 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from text_utils import collapse_whitespace
+
+
+def text_hash(model: str, text: str) -> str:
+    """Cache key: the model plus the text with whitespace collapsed"""
+    normalized = collapse_whitespace(text)
+    return hashlib.sha1(f"{model}\0{normalized}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (model, normalized text hash).
+
+    Vectors live as float32 rows in one memory-mapped file per model; a
+    SQLite index maps each hash to its row and tracks last access. Beyond
+    `max_entries` rows per model the least recently used row is overwritten
+    in place, so the files never grow past the bound.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 100000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, np.memmap] = {}
+        self.stats = {'hits': 0, 'misses': 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, dim INTEGER NOT NULL, rows INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " model TEXT NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " row INTEGER NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (model, hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (model, accessed_at)")
+        self._conn.commit()
+
+    def _path(self, model: str) -> str:
+        safe = "".join(c if c.isalnum() or c in '-_.' else '_' for c in model)
+        return os.path.join(self.directory, f"{safe}.f32")
+
+    def _matrix(self, model: str, dim: int, rows: int) -> np.memmap:
+        """Memory map of the model's vector file, grown to hold at least `rows` rows"""
+        matrix = self._vectors.get(model)
+        if matrix is not None and matrix.shape[0] >= rows:
+            return matrix
+        path = self._path(model)
+        existing = os.path.getsize(path) // (dim * 4) if os.path.exists(path) else 0
+        capacity = max(existing, rows)
+        if capacity > existing:
+            # Grow geometrically up to the bound to keep remaps rare
+            capacity = min(max(capacity, existing * 2, 1024), max(self.max_entries, rows))
+            if matrix is not None:
+                matrix.flush()
+            with open(path, 'ab') as f:
+                f.truncate(capacity * dim * 4)
+        matrix = np.memmap(path, dtype=np.float32, mode='r+', shape=(capacity, dim))
+        self._vectors[model] = matrix
+        return matrix
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached embeddings for the texts, None where missing"""
+        hashes = [text_hash(model, text) for text in texts]
+        with self._lock:
+            meta = self._conn.execute("SELECT dim, rows FROM models WHERE model = ?", (model,)).fetchone()
+            if meta is None:
+                self.stats['misses'] += len(texts)
+                return [None] * len(texts)
+            dim, rows = meta
+            matrix = self._matrix(model, dim, rows)
+
+            found = {}
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                part = hashes[i : i + 500]
+                placeholders = ",".join("?" * len(part))
+                found.update(self._conn.execute(
+                    f"SELECT hash, row FROM entries WHERE model = ? AND hash IN ({placeholders})",
+                    (model, *part)
+                ).fetchall())
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET accessed_at = ? WHERE model = ? AND hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self._conn.commit()
+
+            self.stats['hits'] += sum(1 for h in hashes if h in found)
+            self.stats['misses'] += sum(1 for h in hashes if h not in found)
+            return [matrix[found[h]].tolist() if h in found else None for h in hashes]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        if not texts:
+            return
+        dim = len(vectors[0])
+        now = time.time()
+        with self._lock:
+            meta = self._conn.execute("SELECT dim, rows FROM models WHERE model = ?", (model,)).fetchone()
+            if meta is not None and meta[0] != dim:
+                print(f"Embedding cache: {model} dimension changed from {meta[0]} to {dim}, skipping")
+                return
+            rows = meta[1] if meta else 0
+
+            slots = {}
+            for text, vector in zip(texts, vectors):
+                h = text_hash(model, text)
+                if h in slots:
+                    continue
+                existing = self._conn.execute(
+                    "SELECT row FROM entries WHERE model = ? AND hash = ?", (model, h)
+                ).fetchone()
+                if existing:
+                    row = existing[0]
+                elif rows < self.max_entries:
+                    row = rows
+                    rows += 1
+                else:
+                    # Full: overwrite the least recently used row
+                    victim, row = self._conn.execute(
+                        "SELECT hash, row FROM entries WHERE model = ? ORDER BY accessed_at LIMIT 1", (model,)
+                    ).fetchone()
+                    self._conn.execute("DELETE FROM entries WHERE model = ? AND hash = ?", (model, victim))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (model, hash, row, accessed_at) VALUES (?, ?, ?, ?)",
+                    (model, h, row, now)
+                )
+                slots[h] = (row, vector)
+
+            matrix = self._matrix(model, dim, rows)
+            for row, vector in slots.values():
+                matrix[row] = np.asarray(vector, dtype=np.float32)
+            matrix.flush()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO models (model, dim, rows) VALUES (?, ?, ?)", (model, dim, rows)
+            )
+            self._conn.commit()
@@ -1,12 +1,42 @@
 from google import genai
 from google.genai import types
 import os
-import requests
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from deep_lake_vectordb import query_vector_search, create_embeddings
+from catalog import analysis_catalog, new_record_id
+from product_cache import ProductCache
+from redirect_resolver import RedirectResolver
+from singleflight import SingleFlight
 ANALYSIS_DIR = "analysis_results" 
+
+# Search results per product; stale entries can be served while a background refresh runs
+product_cache = ProductCache(
+    os.getenv('PRODUCT_CACHE_PATH', 'product_cache.db'),
+    ttl=float(os.getenv('PRODUCT_CACHE_TTL', '86400')),
+    stale_ttl=float(os.getenv('PRODUCT_CACHE_STALE_TTL', '604800')),
+    max_entries=int(os.getenv('PRODUCT_CACHE_MAX_ENTRIES', '1000'))
+)
+PRODUCT_CACHE_SERVE_STALE = os.getenv('PRODUCT_CACHE_SERVE_STALE', 'true').lower() not in ('0', 'false', 'no')
+
+# Grounding citations point at redirect URLs; destinations are cached across runs
+redirect_resolver = RedirectResolver(
+    os.getenv('REDIRECT_CACHE_PATH', 'redirect_cache.db'),
+    max_workers=int(os.getenv('REDIRECT_RESOLVE_WORKERS', '8')),
+    background_workers=int(os.getenv('REDIRECT_BACKGROUND_WORKERS', '2'))
+)
+# 'all' resolves every citation before returning, 'youtube' only the YouTube
+# candidates (the rest resolve in the background), 'none' skips resolution
+REDIRECT_RESOLVE_MODE = os.getenv('REDIRECT_RESOLVE_MODE', 'all').lower()
+
+# Concurrent searches for the same product share one Gemini call
+search_flight = SingleFlight(result_ttl=0)
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="product-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
 class SearchAgent:  
 
     def __init__(self, api_key):
@@ -26,13 +56,8 @@ class SearchAgent:
         self.latest_response = None  # Store the latest response
 
     def resolve_redirect_url(self,vertex_url):
-        """Follow the redirect and return the final destination URL."""
-        try:
-            response = requests.get(vertex_url, allow_redirects=True, timeout=5)
-            return response.url  # Returns the final redirected URL
-        except requests.RequestException as e:
-            print(f"Error resolving URL: {vertex_url} -> {e}")
-            return vertex_url  # Return the original if resolution fails
+        """Return the redirect destination URL, or the original if resolution fails."""
+        return redirect_resolver.resolve(vertex_url)
     def query(self, query):
         """Send a query to the Gemini model and return the response object."""
         response = self.client.models.generate_content(
@@ -66,9 +91,17 @@ class SearchAgent:
                         return part.executable_code.code  # Return the code block
         return None  # No executable code found
 
-    def retrieve_citations(self, response, resolve_redirect=True):
-        """Extract citations (source URLs) from the response."""
-        citations = []
+    def retrieve_citations(self, response, resolve_redirect=REDIRECT_RESOLVE_MODE):
+        """
+        Extract citations (source URLs) from the response.
+
+        resolve_redirect is 'all' (or True), 'youtube' or 'none' (or False).
+        Redirects are resolved concurrently; in 'youtube' mode only citations
+        whose source looks like YouTube are resolved before returning, the
+        others keep their redirect URL unless already cached and are
+        resolved in the background for next time.
+        """
+        sources = []
         if hasattr(response, "candidates") and response.candidates:
             candidate = response.candidates[0]
 
@@ -78,17 +111,25 @@ class SearchAgent:
                 if hasattr(grounding_metadata, "grounding_chunks"):
                     for chunk in grounding_metadata.grounding_chunks:
                         if hasattr(chunk, "web") and chunk.web:
-                            title = chunk.web.title
-                            url = chunk.web.uri
+                            sources.append((chunk.web.title, chunk.web.uri))
 
-                            # Resolve redirects if flag is enabled
-                            if resolve_redirect:
-                                url = self.resolve_redirect_url(url)
+        if resolve_redirect is True:
+            resolve_redirect = "all"
+        urls = [url for _, url in sources]
+        if resolve_redirect == "all":
+            urls = redirect_resolver.resolve_many(urls)
+        elif resolve_redirect == "youtube":
+            now = [i for i, (title, _) in enumerate(sources) if "youtube" in (title or "").lower()]
+            for i, final_url in zip(now, redirect_resolver.resolve_many([urls[i] for i in now])):
+                urls[i] = final_url
+            later = [i for i in range(len(urls)) if i not in now]
+            for i in later:
+                urls[i] = redirect_resolver.cached(urls[i]) or urls[i]
+            redirect_resolver.resolve_later(sources[i][1] for i in later if urls[i] == sources[i][1])
 
-                            citations.append(f"{title}: {url}")
-        return citations  # Return list of citations
+        return [f"{title}: {url}" for (title, _), url in zip(sources, urls)]  # Return list of citations
 
-    def get_citations(self, resolve_redirect=True):
+    def get_citations(self, resolve_redirect=REDIRECT_RESOLVE_MODE):
       """Return the latest retrieved citations, with optional redirect resolution."""
       if self.latest_response:
           return self.retrieve_citations(self.latest_response, resolve_redirect)
@@ -108,27 +149,111 @@ class SearchAgent:
 def get_latest_analysis():
     """Get the most recent analysis result"""
     try:
-        analysis_dir = "analysis_results"
-        if not os.path.exists(analysis_dir):
+        entry = analysis_catalog.latest("analysis")
+        if not entry:
             return None
-            
-        # Get the most recent analysis file
-        analysis_files = [f for f in os.listdir(analysis_dir) if f.endswith('.json')]
-        if not analysis_files:
-            return None
-            
-        latest_file = max(analysis_files, key=lambda x: os.path.getctime(os.path.join(analysis_dir, x)))
-        filepath = os.path.join(analysis_dir, latest_file)
-        
-        with open(filepath, 'r', encoding='utf-8') as f:
-            analysis_data = json.load(f)
-            
-        return analysis_data
+        return analysis_catalog.load(entry)
     except Exception as e:
         print(f"Error reading analysis: {str(e)}")
         return None
 
 
+def search_product(product_name: str) -> dict:
+    """
+    Run the Gemini grounded search for a product, without persisting anything
+
+    Args:
+        product_name (str): Product name to analyze
+
+    Returns:
+        dict: Results containing response and citations
+    """
+    API_KEY = os.getenv("GEMINI_API_KEY")
+    search_bot = SearchAgent(API_KEY)
+
+    print(f"\nAnalyzing product: {product_name}")
+
+    # Construct and send query
+    query = f"{product_name} - give me details about the product and cite top youtube reviews about the product if you find it."
+    search_bot.query(query)
+
+    # Get response and citations
+    response = search_bot.answer()
+    citations = search_bot.get_citations()
+
+    # Find first YouTube citation
+    first_youtube_cite = None
+    for cite in citations:
+        if "youtube" in cite.lower():
+            first_youtube_cite = cite
+            break
+
+    return {
+        "product_name": product_name,
+        "response": response,
+        "citations": citations,
+        "youtube_citation": first_youtube_cite,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _search_and_cache(product_name: str) -> dict:
+    results = search_product(product_name)
+    if results.get('response'):
+        product_cache.put(product_name, results)
+    return results
+
+
+def _refresh_product(product_name: str, key: str):
+    """Re-run a stale product's search, then cache and persist the new results"""
+    try:
+        results, leader = search_flight.do_leader(key, lambda: _search_and_cache(product_name))
+        # A concurrent miss that ran the search persists it itself
+        if leader:
+            embed_gemini_results(results)
+            save_gemini_results(results)
+    except Exception as e:
+        print(f"Error refreshing search results for {product_name}: {str(e)}")
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
+
+
+def cached_search_product(product_name: str, serve_stale: bool = PRODUCT_CACHE_SERVE_STALE) -> dict:
+    """
+    search_product with the persistent product cache in front
+
+    A fresh entry is returned directly. A stale one is returned as well when
+    `serve_stale` is set, and a single background refresh per product is
+    started. The results carry a 'cache' entry whose 'persist' flag is set
+    only for the caller that actually ran the search: on a hit, or when
+    sharing another caller's in-flight search, the response is embedded and
+    saved elsewhere, so callers persist it only when the flag is set.
+
+    Args:
+        product_name (str): Product name to analyze
+        serve_stale (bool): Answer from an expired entry while it refreshes
+
+    Returns:
+        dict: Results containing response, citations and cache status
+    """
+    key = ProductCache.key(product_name)
+    cached = product_cache.get(product_name)
+    if cached:
+        results, fresh = cached
+        if fresh or serve_stale:
+            if not fresh:
+                with _refreshing_lock:
+                    start_refresh = key not in _refreshing
+                    _refreshing.add(key)
+                if start_refresh:
+                    _refresh_executor.submit(_refresh_product, product_name, key)
+            return {**results, "cache": {"hit": True, "stale": not fresh, "persist": False}}
+
+    results, leader = search_flight.do_leader(key, lambda: _search_and_cache(product_name))
+    return {**results, "cache": {"hit": False, "stale": False, "persist": leader}}
+
+
 def process_product_analysis(product_name: str = None) -> dict:
     """
     Process product analysis using Gemini search
@@ -140,9 +265,6 @@ def process_product_analysis(product_name: str = None) -> dict:
         dict: Results containing response and citations
     """
     try:
-        API_KEY = os.getenv("GEMINI_API_KEY")
-        search_bot = SearchAgent(API_KEY)
-
         if not product_name:
             # Get the latest analysis result
             analysis_data = get_latest_analysis()
@@ -155,34 +277,12 @@ def process_product_analysis(product_name: str = None) -> dict:
                 print("No product name found in analysis")
                 return None
 
-        print(f"\nAnalyzing product: {product_name}")
-        
-        # Construct and send query
-        query = f"{product_name} - give me details about the product and cite top youtube reviews about the product if you find it."
-        search_bot.query(query)
+        results = cached_search_product(product_name)
 
-        # Get response and citations
-        response = search_bot.answer()
-        citations = search_bot.get_citations()
-        
-        # Find first YouTube citation
-        first_youtube_cite = None
-        for cite in citations:
-            if "youtube" in cite.lower():
-                first_youtube_cite = cite
-                break
-
-        # Prepare results
-        results = {
-            "product_name": product_name,
-            "response": response,
-            "citations": citations,
-            "youtube_citation": first_youtube_cite,
-            "timestamp": datetime.now().isoformat()
-        }
-
-        # Save results
-        save_gemini_results(results)
+        # Only the caller that ran the search persists it; cached and shared results already were
+        if results['cache']['persist']:
+            embed_gemini_results(results)
+            save_gemini_results(results)
         
         return results
 
@@ -190,25 +290,34 @@ def process_product_analysis(product_name: str = None) -> dict:
         print(f"Error in Gemini search: {str(e)}")
         return None
 
+
+def embed_gemini_results(results: dict):
+    """Add the product summary to the vector DB"""
+    try:
+        print("CREATING EMBEDDINGS for PRODUCT SUMMARY....")
+        # Stored under the full product name so retrieval can filter on it
+        create_embeddings(results['response'], results['product_name'])
+        print("EMBEDDINGS CREATED for PRODUCT SUMMARY")
+    except Exception as e:
+        print(f"Error creating embeddings: {str(e)}")
+
+
 def save_gemini_results(results: dict) -> str:
     """Save Gemini search results to a JSON file"""
     try:
         if not os.path.exists(ANALYSIS_DIR):
             os.makedirs(ANALYSIS_DIR)
 
-        #add_embeddings to vector db
-        print("CREATING EMBEDDINGS for PRODUCT SUMMARY....")
-        create_embeddings(results['response'], results['product_name'].split(' ')[0])
-        print("EMBEDDINGS CREATED for PRODUCT SUMMARY")
         product_name = results['product_name']
         clean_name = "".join(c for c in product_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        record_id = new_record_id()
         
-        filename = f"gemini_{clean_name.split(' ')[0]}_{timestamp}.json"
+        filename = f"gemini_{clean_name.split(' ')[0]}_{record_id}.json"
         filepath = os.path.join(ANALYSIS_DIR, filename)
         
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(results, f, indent=4)
+        analysis_catalog.record("gemini", product_name, filepath, record_id=record_id)
             
         print(f"Gemini results saved to: {filepath}")
         return filepath
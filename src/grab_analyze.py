@@ -1,19 +1,41 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import base64
-from PIL import Image
-from io import BytesIO
+import mimetypes
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from dotenv import load_dotenv
-import aiohttp
+from http_client import http_client, http_client_lifespan
 import json
 from test_snova import analyze_image
-from gemini_search import process_product_analysis
+from image_cache import PerceptualCache
+from image_preprocess import preprocess_image
+from product_extract import extract_product_name
+from gemini_search import cached_search_product, save_gemini_results, embed_gemini_results
+from jobs import JobManager
+from catalog import analysis_catalog, new_record_id
+from pipeline import Pipeline
 load_dotenv()
 
 
-app = FastAPI()
+# Uploads are processed as background jobs; blocking stages share one worker pool
+jobs = JobManager(
+    max_concurrent_jobs=int(os.getenv('MAX_CONCURRENT_JOBS', '8')),
+    max_workers=int(os.getenv('JOB_WORKERS', '8'))
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    async with http_client_lifespan(app):
+        yield
+    jobs.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 ANALYSIS_DIR = "analysis_results"
 # Add CORS middleware to allow requests from the Chrome extension
 app.add_middleware(
@@ -34,34 +56,51 @@ SCREENSHOTS_DIR = "screenshots"
 if not os.path.exists(SCREENSHOTS_DIR):
     os.makedirs(SCREENSHOTS_DIR)
 
+# Set SAVE_SCREENSHOTS=false to skip keeping uploaded screenshots on disk
+SAVE_SCREENSHOTS = os.getenv('SAVE_SCREENSHOTS', 'true').lower() not in ('0', 'false', 'no')
+
 # Add this constant after other constants
 ANALYSIS_DIR = "analysis_results"
 if not os.path.exists(ANALYSIS_DIR):
     os.makedirs(ANALYSIS_DIR)
 
+# Vision results for recently seen screenshots, matched by perceptual hash
+vision_cache = PerceptualCache(
+    max_distance=int(os.getenv('VISION_CACHE_MAX_DISTANCE', '10')),
+    ttl=float(os.getenv('VISION_CACHE_TTL', '600'))
+)
+
+def write_screenshot(filepath: str, image_data: str) -> bool:
+    """Decode a base64 screenshot and write the original bytes to disk"""
+    try:
+        with open(filepath, 'wb') as f:
+            f.write(base64.b64decode(image_data))
+        print(f"Screenshot received and saved as {os.path.basename(filepath)}")
+        return True
+    except Exception as e:
+        print(f"Error writing screenshot {filepath}: {str(e)}")
+        return False
+
+
 async def send_to_service(analysis_data):
     try:
-        async with aiohttp.ClientSession() as session:
-            service_url = os.getenv('SERVICE_URL', 'http://localhost:8000/api/analysis')
-            async with session.post(service_url, json=analysis_data) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    print(f"Error sending to service: {response.status}")
-                    return None
+        service_url = os.getenv('SERVICE_URL', 'http://localhost:8000/api/analysis')
+        async with http_client.request("POST", service_url, json=analysis_data) as response:
+            if response.status == 200:
+                return await response.json()
+            else:
+                print(f"Error sending to service: {response.status}")
+                return None
     except Exception as e:
         print(f"Error sending to service: {str(e)}")
         return None
 
-async def save_analysis_result(analysis_data: dict) -> str:
-    """Save analysis result to a JSON file"""
+def save_analysis_result(analysis_data: dict, filepath: str, record_id: str) -> str:
+    """Save analysis result to a JSON file and record it in the catalog"""
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"analysis_{timestamp}.json"
-        filepath = os.path.join(ANALYSIS_DIR, filename)
-        
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(analysis_data, f, indent=4)
+        analysis_catalog.record("analysis", analysis_data.get('product_name'), filepath, record_id=record_id)
             
         print(f"Analysis saved to: {filepath}")
         return filepath
@@ -71,73 +110,161 @@ async def save_analysis_result(analysis_data: dict) -> str:
 
 
 
-@app.post("/uploadimage")
-async def save_screenshot(request: Request):
-    try:
-        # Get the JSON data from the request
-        data = await request.json()
-        
-        # Get the base64 image data
-        image_data = data['image']
-        
-        # Remove the data URL prefix (e.g., "data:image/png;base64,")
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
-            
-        # Decode base64 string to image
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(BytesIO(image_bytes))
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"screenshot_{timestamp}.png"
-        filepath = os.path.join(SCREENSHOTS_DIR, filename)
-        
-        # Save the image
-        image.save(filepath)
-        print(f"Screenshot received and saved as {filename}")
-        
-        # Analyze the image
-        analysis = await analyze_image()
-        try : 
-            # breakpoint()
-            import ast
-            content = ast.literal_eval(analysis)
-            try: 
-                product_name = content['product_name']
-            except Exception as e:
-                print(f"Error parsing product name from analysis JSON: {str(e)}")
-                assert False, "Error parsing product name from analysis"
-            if product_name == "":  
+async def analyze_screenshot(job_id: str, data: dict) -> dict:
+    """
+    Run the screenshot -> product name -> Gemini search pipeline for one upload
+
+    Only preprocessing, the vision call and the grounded search are on the
+    critical path. Writing the screenshot, the analysis JSON, the Gemini
+    JSON and the embeddings are background stages that overlap with it or
+    finish after the job result is available.
+    """
+    # Split the data URL (e.g. "data:image/png;base64,...") into MIME type and payload
+    image_data = data['image']
+    mime_type = "image/png"
+    if ',' in image_data:
+        header, image_data = image_data.split(',', 1)
+        if header.startswith('data:'):
+            mime_type = header[5:].split(';')[0] or mime_type
+
+    # Generate filenames with timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    extension = mimetypes.guess_extension(mime_type) or ".png"
+    filepath = os.path.join(SCREENSHOTS_DIR, f"screenshot_{timestamp}{extension}") if SAVE_SCREENSHOTS else None
+    analysis_id = new_record_id()
+    analysis_file = os.path.join(ANALYSIS_DIR, f"analysis_{analysis_id}.json")
+
+    # Background stages use the default thread pool so they never hold up
+    # the job workers that the critical stages run on
+    async def persist_screenshot():
+        # The path is published on the job only once the file exists, as the
+        # job result may be ready before this stage finishes
+        if filepath:
+            if not await asyncio.to_thread(write_screenshot, filepath, image_data):
+                raise OSError(f"Could not write {filepath}")
+            jobs.update(job_id, screenshot_path=filepath)
+
+    async def preprocess():
+        # Downscale/re-encode before the vision call; CPU-bound, so off the event loop
+        return await jobs.run_blocking(preprocess_image, image_data, mime_type)
+
+    async def vision(preprocess):
+        preprocessing = preprocess['metadata']
+
+        # Near-identical screenshots (repeated hotkey presses on the same
+        # page) reuse the earlier vision result instead of a new vision call
+        image_hash = preprocess['image_hash']
+        cached = vision_cache.get(image_hash)
+        if cached:
+            analysis = cached['analysis']
+            product_name = cached['product_name']
+        else:
+            vision_started = time.perf_counter()
+            analysis = await analyze_image(preprocess['image_data'], preprocess['mime_type'])
+            preprocessing['vision_ms'] = round((time.perf_counter() - vision_started) * 1000, 1)
+            # The extractor tolerates code fences, prose and single-quoted dicts around the value
+            product_name = extract_product_name(analysis)
+            if not product_name:
                 print(f"Image analysis: {analysis}")
-                assert False, "Product name is empty"
-        except Exception as e:
-            print(f"Error parsing product name from analysis: {str(e)}")
-            assert False, "Error parsing product name from analysis"
-        
+                raise ValueError("Could not find a product name in the image analysis")
+            vision_cache.put(image_hash, {'analysis': analysis, 'product_name': product_name})
+
         print(f"Product name: {product_name}")
-        
-        # After analyzing the image and getting product_name
-        analysis_result = {
+        return {
             "status": "success",
-            "filepath": filepath,
             "analysis": analysis,
             "product_name": product_name,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Save analysis result to JSON
-        analysis_file = await save_analysis_result(analysis_result)
-        
-        # Process with Gemini search
-        gemini_results = process_product_analysis(product_name)
-        
-        # Include both results in the return
-        return {
-            **analysis_result,
-            "analysis_file": analysis_file,
-            "gemini_results": gemini_results
+            "timestamp": datetime.now().isoformat(),
+            "vision_cache": {"hit": bool(cached), **vision_cache.stats()},
+            "preprocessing": preprocessing
         }
+
+    async def save_analysis(vision):
+        await asyncio.to_thread(save_analysis_result, vision, analysis_file, analysis_id)
+
+    async def search(vision):
+        # The grounded search and redirect resolution are blocking, so they run on the worker pool
+        try:
+            return await jobs.run_blocking(cached_search_product, vision['product_name'])
+        except Exception as e:
+            print(f"Error in Gemini search: {str(e)}")
+            return None
+
+    # Only the caller that ran the search persists it; cached and shared results already were
+    async def save_search(search):
+        if search and search['cache']['persist']:
+            await asyncio.to_thread(save_gemini_results, search)
+
+    async def embed(search):
+        if search and search['cache']['persist']:
+            await asyncio.to_thread(embed_gemini_results, search)
+
+    pipeline = (
+        Pipeline()
+        .add("persist_screenshot", persist_screenshot, critical=False)
+        .add("preprocess", preprocess)
+        .add("vision", vision, deps=["preprocess"])
+        .add("save_analysis", save_analysis, deps=["vision"], critical=False)
+        .add("search", search, deps=["vision"])
+        .add("save_search", save_search, deps=["search"], critical=False)
+        .add("embed", embed, deps=["search"], critical=False)
+    )
+
+    stages = {}
+
+    def on_stage(name: str, state: str):
+        stages[name] = state
+        fields = {"stages": dict(stages)}
+        job = jobs.get(job_id)
+        # Background stages may still report after the job result is set
+        if state == "running" and job and job['status'] == "running":
+            fields["stage"] = name
+        jobs.update(job_id, **fields)
+
+    results = await pipeline.run(on_stage)
+
+    # Include both results in the return
+    return {
+        **results['vision'],
+        "analysis_id": analysis_id,
+        "analysis_file": analysis_file,
+        "gemini_results": results['search']
+    }
+
+
+@app.post("/uploadimage")
+async def save_screenshot(request: Request, wait: bool = False):
+    """
+    Queue a screenshot for analysis and return its job ID immediately
+
+    Poll GET /jobs/{job_id} or follow /ws/jobs/{job_id} for the result.
+    Pass ?wait=true to block until the job finishes and get the result directly.
+    """
+    try:
+        # Get the JSON data from the request
+        data = await request.json()
+        if not data or 'image' not in data:
+            return {
+                "status": "error",
+                "message": "Missing required parameter: image"
+            }
+
+        job_id = jobs.submit(analyze_screenshot, data)
+        if not wait:
+            return {
+                "status": "queued",
+                "job_id": job_id,
+                "status_url": f"/jobs/{job_id}"
+            }
+
+        job = await jobs.wait(job_id)
+        if job['status'] == "error":
+            return {
+                "status": "error",
+                "message": job['error'],
+                "job_id": job_id
+            }
+        return {**job['result'], "job_id": job_id}
         
     except Exception as e:
         print(f"Error saving screenshot: {str(e)}")
@@ -145,6 +272,31 @@ async def save_screenshot(request: Request):
             "status": "error",
             "message": str(e)
         }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Return a job's status, current stage and, once finished, its result or error"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.websocket("/ws/jobs/{job_id}")
+async def follow_job(websocket: WebSocket, job_id: str):
+    """Push the job's state on every stage change until it finishes"""
+    await websocket.accept()
+    if jobs.get(job_id) is None:
+        await websocket.send_json({"status": "error", "message": "Job not found"})
+        await websocket.close()
+        return
+    try:
+        async for job in jobs.subscribe(job_id):
+            await websocket.send_json(job)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
     
 
 if __name__ == "__main__":
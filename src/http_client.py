@@ -0,0 +1,112 @@
+import asyncio
+import os
+import random
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import aiohttp
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HttpClient:
+    """
+    Application-scoped aiohttp session with connection pooling and retries.
+
+    One keep-alive connection pool is shared by every outbound call (vision,
+    summaries, downstream services), with a per-host connection cap and
+    timeouts. 429/5xx responses and connection errors are retried with
+    jittered exponential backoff, honouring Retry-After when present.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 20, total_timeout: float = 120.0,
+                 connect_timeout: float = 10.0, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Open the shared session; call from the app lifespan"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=60,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HTTP client is not started")
+        return self._session
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # Full jitter: spread retries from many clients over the whole window
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs):
+        """
+        Send a request with retries and yield the response
+
+        The response is yielded unread, so callers can stream the body. After
+        the last retry a 429/5xx response is yielded as is for the caller to
+        report.
+        """
+        # Scripts outside the FastAPI app get a session on first use
+        await self.start()
+        attempt = 0
+        while True:
+            try:
+                response = await self.session.request(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"Request to {url} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            else:
+                if response.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    try:
+                        yield response
+                    finally:
+                        response.release()
+                    return
+                delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                print(f"Request to {url} returned {response.status}, retrying in {delay:.1f}s")
+                response.release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+http_client = HttpClient(
+    limit=int(os.getenv('HTTP_POOL_LIMIT', '100')),
+    limit_per_host=int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20')),
+    max_retries=int(os.getenv('HTTP_MAX_RETRIES', '3'))
+)
+
+
+@asynccontextmanager
+async def http_client_lifespan(app):
+    """FastAPI lifespan that opens and closes the shared HTTP client"""
+    await http_client.start()
+    try:
+        yield
+    finally:
+        await http_client.close()
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from PIL import Image
+
+
+def dhash(image: Image.Image, hash_size: int = 16) -> int:
+    """
+    Difference hash: compare adjacent pixels of a small grayscale thumbnail
+
+    Visually near-identical images (same page re-captured, small scroll or
+    cursor changes) produce hashes only a few bits apart. The default
+    256-bit hash keeps enough detail to tell apart different products shown
+    in the same page layout, which an 8x8 hash does not.
+    """
+    thumbnail = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(thumbnail.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class PerceptualCache:
+    """
+    Cache keyed by perceptual hash, matching within a Hamming-distance threshold.
+
+    Lookups scan every live entry, which is fine for the few hundred
+    screenshots of a browsing session and keeps near-duplicate matching exact.
+    """
+
+    def __init__(self, max_distance: int = 10, ttl: float = 600.0, max_entries: int = 256):
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_hash: int) -> Optional[Any]:
+        """Return the value of the closest fresh entry within the threshold, or None"""
+        with self._lock:
+            now = time.time()
+            best_key = None
+            best_distance = self.max_distance + 1
+            for key, (value, stored_at) in list(self._entries.items()):
+                if now - stored_at >= self.ttl:
+                    del self._entries[key]
+                    continue
+                distance = hamming_distance(key, image_hash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][0]
+
+    def put(self, image_hash: int, value: Any):
+        with self._lock:
+            self._entries[image_hash] = (value, time.time())
+            self._entries.move_to_end(image_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
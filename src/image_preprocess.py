@@ -0,0 +1,111 @@
+import base64
+import os
+import time
+from io import BytesIO
+
+from PIL import Image, ImageChops
+
+from image_cache import dhash
+
+# Longest edge sent to the vision model; 0 disables downscaling
+IMAGE_MAX_EDGE = int(os.getenv('IMAGE_MAX_EDGE', '1280'))
+# JPEG or WEBP; anything else keeps the uploaded encoding
+IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', 'JPEG').upper()
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '85'))
+IMAGE_CROP = os.getenv('IMAGE_CROP', 'false').lower() in ('1', 'true', 'yes')
+
+# Crop only when the content box drops at least this share of the area
+MIN_CROP_SAVING = 0.1
+CROP_MARGIN = 16
+
+
+def crop_to_content(image: Image.Image) -> Image.Image:
+    """
+    Crop away uniform page background around the content
+
+    The background colour is taken from the top-left pixel; anything that
+    differs from it noticeably counts as content.
+    """
+    rgb = image.convert('RGB')
+    background = Image.new('RGB', rgb.size, rgb.getpixel((0, 0)))
+    diff = ImageChops.difference(rgb, background).convert('L').point(lambda p: 255 if p > 24 else 0)
+    bbox = diff.getbbox()
+    if not bbox:
+        return image
+
+    left, top, right, bottom = bbox
+    left, top = max(left - CROP_MARGIN, 0), max(top - CROP_MARGIN, 0)
+    right, bottom = min(right + CROP_MARGIN, image.width), min(bottom + CROP_MARGIN, image.height)
+    if (right - left) * (bottom - top) > (1 - MIN_CROP_SAVING) * image.width * image.height:
+        return image
+    return image.crop((left, top, right, bottom))
+
+
+def preprocess_image(image_data: str, mime_type: str, max_edge: int = IMAGE_MAX_EDGE,
+                     output_format: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY,
+                     crop: bool = IMAGE_CROP) -> dict:
+    """
+    Shrink a base64 screenshot before it is sent to the vision model
+
+    The image is decoded once, optionally cropped to its content, downscaled
+    so its longest edge is at most `max_edge` and re-encoded. If that does
+    not make the payload smaller, the original is kept. The perceptual hash
+    is computed from the same decoded image, cropped to its content.
+
+    Args:
+        image_data (str): Base64-encoded image
+        mime_type (str): MIME type of the encoded image
+        max_edge (int): Longest edge in pixels; 0 keeps the original size
+        output_format (str): 'JPEG' or 'WEBP'; anything else keeps the original encoding
+        quality (int): Encoder quality for JPEG/WEBP
+        crop (bool): Crop to the non-background region first
+
+    Returns:
+        dict: 'image_data', 'mime_type', 'image_hash' and 'metadata' with size and timing figures
+    """
+    started = time.perf_counter()
+    original_bytes = base64.b64decode(image_data)
+
+    with Image.open(BytesIO(original_bytes)) as image:
+        image.load()
+        original_size = image.size
+        # Hash the content region, not the surrounding page chrome and margins
+        image_hash = dhash(crop_to_content(image))
+
+        processed = image
+        if crop:
+            processed = crop_to_content(processed)
+        if max_edge and max(processed.size) > max_edge:
+            processed = processed.copy()
+            processed.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        # Keep the upload as is unless re-encoding actually makes it smaller
+        result_data, result_mime = image_data, mime_type
+        result_bytes, result_size = len(original_bytes), original_size
+        if output_format in ('JPEG', 'WEBP') or processed is not image:
+            save_format = output_format if output_format in ('JPEG', 'WEBP') else (image.format or 'PNG')
+            if save_format == 'JPEG' and processed.mode not in ('RGB', 'L'):
+                processed = processed.convert('RGB')
+            buffer = BytesIO()
+            processed.save(buffer, format=save_format, quality=quality)
+            if buffer.tell() < len(original_bytes):
+                result_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
+                result_mime = Image.MIME.get(save_format, mime_type)
+                result_bytes, result_size = buffer.tell(), processed.size
+
+    return {
+        'image_data': result_data,
+        'mime_type': result_mime,
+        'image_hash': image_hash,
+        'metadata': {
+            'original_bytes': len(original_bytes),
+            'processed_bytes': result_bytes,
+            'original_base64_chars': len(image_data),
+            'processed_base64_chars': len(result_data),
+            'bytes_saved_pct': round(100 * (1 - result_bytes / max(len(original_bytes), 1)), 1),
+            'original_size': list(original_size),
+            'processed_size': list(result_size),
+            'mime_type': result_mime,
+            'preprocess_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+    }
@@ -0,0 +1,109 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+from yt_api import YouTubeProcessor
+
+DEFAULT_CONCURRENCY = 8
+
+
+def read_video_ids(processor: YouTubeProcessor, urls_file: str) -> List[str]:
+    """Read one YouTube URL (or bare video ID) per line, skipping blanks and comments"""
+    video_ids = []
+    with open(urls_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            video_id = processor.extract_video_id(line) or (line if len(line) == 11 else None)
+            if video_id:
+                video_ids.append(video_id)
+            else:
+                print(f"Skipping invalid YouTube URL: {line}")
+    return video_ids
+
+
+def ingest_videos(processor: YouTubeProcessor, video_ids: List[str],
+                  concurrency: int = DEFAULT_CONCURRENCY, output_dir: str = "transcripts",
+                  export_text: bool = True) -> Dict[str, str]:
+    """
+    Fetch metadata and transcripts for many videos and save them
+
+    Metadata is fetched up front in batches of 50 IDs; transcripts are then
+    pulled concurrently by at most `concurrency` workers.
+
+    Args:
+        processor (YouTubeProcessor): Processor whose cache receives the results
+        video_ids (List[str]): YouTube video IDs to ingest
+        concurrency (int): Maximum concurrent transcript fetches
+        output_dir (str): Directory passed to save_transcript
+        export_text (bool): Also write a .txt file per video next to the transcript store
+
+    Returns:
+        Dict[str, str]: Saved transcript path by video ID, for the videos that succeeded
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    print(f"Fetching metadata for {len(video_ids)} videos...")
+    video_infos = processor.get_video_info_batch(video_ids)
+
+    # The discovery client is not thread-safe, so workers are handed the
+    # batch-fetched metadata and never call the Data API themselves
+    available = [video_id for video_id in video_ids if video_id in video_infos]
+    for video_id in video_ids:
+        if video_id not in video_infos:
+            print(f"Skipping unavailable video: {video_id}")
+
+    saved = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(processor.save_transcript, video_id, output_dir,
+                            video_infos[video_id], export_text): video_id
+            for video_id in available
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            video_id = futures[future]
+            filepath = future.result()
+            if filepath:
+                saved[video_id] = filepath
+            print(f"[{completed}/{len(available)}] {video_id}: {'ok' if filepath else 'failed'}")
+
+    print(f"\nIngested {len(saved)} of {len(video_ids)} videos")
+    return saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest YouTube transcripts and metadata")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--playlist', help="Playlist URL or ID")
+    source.add_argument('--channel', help="Channel URL, ID (UC...) or @handle")
+    source.add_argument('--urls-file', help="File with one video URL per line")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum concurrent transcript fetches")
+    parser.add_argument('--output-dir', default="transcripts", help="Where to save text exports")
+    parser.add_argument('--no-text-export', action='store_true',
+                        help="Only write the columnar transcript store, not per-video .txt files")
+    args = parser.parse_args()
+
+    processor = YouTubeProcessor()
+
+    if args.playlist:
+        playlist_id = processor.extract_playlist_id(args.playlist)
+        if not playlist_id:
+            print("Invalid playlist URL")
+            return
+        video_ids = processor.get_playlist_video_ids(playlist_id)
+    elif args.channel:
+        video_ids = processor.get_channel_video_ids(args.channel)
+    else:
+        video_ids = read_video_ids(processor, args.urls_file)
+
+    if not video_ids:
+        print("No videos found")
+        return
+
+    ingest_videos(processor, video_ids, concurrency=args.concurrency, output_dir=args.output_dir,
+                  export_text=not args.no_text_export)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Job lifecycle: queued -> running -> success | error
+FINAL_STATUSES = ("success", "error")
+
+
+class JobManager:
+    """
+    In-process job queue for request pipelines that outlive the HTTP request.
+
+    Each submitted job runs as an asyncio task, at most `max_concurrent_jobs`
+    at a time. Blocking stages (synchronous SDK calls, disk and network I/O)
+    go through run_blocking onto a bounded thread pool so they never stall
+    the event loop. Job state can be polled with get() or followed with
+    subscribe(); finished jobs are kept for `ttl` seconds, up to `max_jobs`.
+    """
+
+    def __init__(self, max_concurrent_jobs: int = 8, max_workers: int = 8,
+                 max_jobs: int = 1000, ttl: float = 3600.0):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._subscribers: Dict[str, set] = {}
+        self._tasks = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+        self._max_concurrent_jobs = max_concurrent_jobs
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def submit(self, pipeline: Callable[..., Awaitable[Any]], *args) -> str:
+        """
+        Queue pipeline(job_id, *args) and return the new job ID immediately
+
+        The pipeline's return value becomes the job result; an exception
+        marks the job as failed with its message.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent_jobs)
+        self._prune()
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",
+            "stage": None,
+            "created_at": now,
+            "updated_at": now,
+            "result": None,
+            "error": None,
+        }
+        task = asyncio.create_task(self._run(job_id, pipeline, *args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def _run(self, job_id: str, pipeline, *args):
+        async with self._semaphore:
+            self.update(job_id, status="running")
+            try:
+                result = await pipeline(job_id, *args)
+                self.update(job_id, status="success", stage=None, result=result)
+            except Exception as e:
+                print(f"Job {job_id} failed: {str(e)}")
+                self.update(job_id, status="error", error=str(e) or e.__class__.__name__)
+
+    async def run_blocking(self, fn: Callable, *args):
+        """Run a blocking function on the worker pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def update(self, job_id: str, **fields):
+        """Update a job's fields (e.g. stage) and notify subscribers"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.update(fields, updated_at=time.time())
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait(dict(job))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def subscribe(self, job_id: str):
+        """Yield the job's state now and after every update until it finishes"""
+        job = self.get(job_id)
+        if job is None:
+            return
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            yield job
+            while job["status"] not in FINAL_STATUSES:
+                job = await queue.get()
+                yield job
+        finally:
+            self._subscribers[job_id].discard(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    async def wait(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Wait for a job to finish and return its final state"""
+        job = None
+        async for job in self.subscribe(job_id):
+            pass
+        return job
+
+    def _prune(self):
+        """Drop finished jobs past their TTL, and the oldest finished ones beyond max_jobs"""
+        now = time.time()
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINAL_STATUSES]
+        for job_id in finished:
+            if now - self._jobs[job_id]["updated_at"] > self.ttl:
+                del self._jobs[job_id]
+        for job_id in finished:
+            if len(self._jobs) < self.max_jobs:
+                break
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
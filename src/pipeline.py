@@ -0,0 +1,108 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+# Strong references to background stages still running after run() returned
+_background_tasks = set()
+
+
+class _DependencyFailed(Exception):
+    """Raised by a stage skipped because a stage it depends on failed"""
+
+    def __init__(self, name: str, cause: BaseException):
+        super().__init__(f"Stage '{name}' skipped: {str(cause)}")
+        # The original error, not another skip
+        self.cause = cause.cause if isinstance(cause, _DependencyFailed) else cause
+
+
+def _log_stage_failure(name: str):
+    def callback(task: asyncio.Task):
+        # Skipped stages are not failures of their own; the failed stage is reported once
+        if not task.cancelled() and task.exception() is not None \
+                and not isinstance(task.exception(), _DependencyFailed):
+            print(f"Background stage '{name}' failed: {str(task.exception())}")
+    return callback
+
+
+class Pipeline:
+    """
+    Async stages with explicit dependencies.
+
+    Every stage starts as soon as the stages it depends on have finished, so
+    independent stages overlap. Each stage function is called with its
+    dependencies' results as keyword arguments; if a dependency failed, the
+    stage is skipped instead. run() returns once the critical stages are
+    done; non-critical stages (disk writes, ingestion) keep running in the
+    background after the caller has responded.
+    """
+
+    def __init__(self):
+        self._stages: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def add(self, name: str, fn: Callable[..., Awaitable[Any]], deps: Iterable[str] = (),
+            critical: bool = True) -> "Pipeline":
+        """
+        Register a stage; dependencies must already be registered
+
+        Args:
+            name (str): Stage name, also the keyword its result is passed as
+            fn: Async function taking the dependency results as keyword arguments
+            deps: Names of stages that must finish first
+            critical (bool): Whether run() waits for this stage
+        """
+        deps = tuple(deps)
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = (fn, deps, critical)
+        return self
+
+    async def _run_stage(self, name: str, fn, deps, dep_tasks, on_stage):
+        results = await asyncio.gather(*dep_tasks, return_exceptions=True)
+        failed = next((result for result in results if isinstance(result, BaseException)), None)
+        if failed is not None:
+            if on_stage:
+                on_stage(name, "skipped")
+            raise _DependencyFailed(name, failed)
+        if on_stage:
+            on_stage(name, "running")
+        try:
+            result = await fn(**dict(zip(deps, results)))
+        except Exception:
+            if on_stage:
+                on_stage(name, "error")
+            raise
+        if on_stage:
+            on_stage(name, "done")
+        return result
+
+    async def run(self, on_stage: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """
+        Start every stage and wait for the critical ones
+
+        Args:
+            on_stage: Called as (stage, state) with state 'running', 'done', 'error'
+                or 'skipped'
+
+        Returns:
+            Dict[str, Any]: Results of the critical stages by name
+
+        Raises:
+            Exception: The first error of a critical stage, or of a stage one depends on
+        """
+        tasks = {}
+        for name, (fn, deps, critical) in self._stages.items():
+            task = asyncio.create_task(self._run_stage(name, fn, deps, [tasks[d] for d in deps], on_stage))
+            tasks[name] = task
+            if not critical:
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+                task.add_done_callback(_log_stage_failure(name))
+
+        critical = [name for name, (_, _, is_critical) in self._stages.items() if is_critical]
+        # Wait for every critical stage, so none is left running or unretrieved
+        results = await asyncio.gather(*(tasks[name] for name in critical), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result.cause if isinstance(result, _DependencyFailed) else result
+        return dict(zip(critical, results))
@@ -0,0 +1,93 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+from text_utils import normalize_query
+
+
+class ProductCache:
+    """
+    Persistent cache of product search results in SQLite, keyed by normalized product name.
+
+    Entries younger than `ttl` are fresh. Older entries stay servable as
+    stale for another `stale_ttl` seconds so callers can answer immediately
+    and refresh in the background; after that they are dropped. Beyond
+    `max_entries` the least recently read entries are evicted.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400.0, stale_ttl: float = 7 * 86400.0,
+                 max_entries: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS products ("
+            " key TEXT PRIMARY KEY,"
+            " product_name TEXT NOT NULL,"
+            " results TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS products_accessed_at ON products (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(product_name: str) -> str:
+        return normalize_query(product_name)
+
+    def get(self, product_name: str) -> Optional[Tuple[dict, bool]]:
+        """Return (results, is_fresh) for a product, or None if missing or expired"""
+        key = self.key(product_name)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, created_at FROM products WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl + self.stale_ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM products WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.stats['misses'] += 1
+                return None
+
+            self._conn.execute("UPDATE products SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            fresh = now - row[1] < self.ttl
+            self.stats['hits' if fresh else 'stale_hits'] += 1
+            return json.loads(row[0]), fresh
+
+    def put(self, product_name: str, results: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO products (key, product_name, results, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.key(product_name), product_name, json.dumps(results), now, now)
+            )
+            self._conn.execute(
+                "DELETE FROM products WHERE key IN ("
+                " SELECT key FROM products ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def invalidate(self, product_name: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM products WHERE key = ?", (self.key(product_name),))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
@@ -0,0 +1,63 @@
+import ast
+import json
+import re
+from typing import Optional
+
+# A 'product_name' key followed by a complete quoted value. Matches inside
+# code fences, surrounding prose and Python-style single-quoted dicts alike.
+PRODUCT_NAME_PATTERN = re.compile(
+    r'''["']product_name["']\s*:\s*(?:"((?:[^"\\]|\\.)*)"|'((?:[^'\\]|\\.)*)')'''
+)
+
+
+def _unquote(value: str, quote: str) -> str:
+    try:
+        if quote == '"':
+            return json.loads(f'"{value}"')
+        return ast.literal_eval(f"'{value}'")
+    except (ValueError, SyntaxError):
+        return value
+
+
+def extract_product_name(text: str) -> Optional[str]:
+    """
+    Return the first complete, non-empty product_name value in the text, or None
+
+    The value only counts once its closing quote is present, so this can be
+    called on a partial response while it is still streaming in.
+    """
+    for match in PRODUCT_NAME_PATTERN.finditer(text):
+        if match.group(1) is not None:
+            value = _unquote(match.group(1), '"')
+        else:
+            value = _unquote(match.group(2), "'")
+        if value.strip():
+            return value.strip()
+    return None
+
+
+class ProductNameExtractor:
+    """
+    Incremental product_name extraction over streamed response deltas.
+
+    Vision responses are a few dozen tokens, so each feed() rescans the
+    buffer from the first possible key position instead of keeping parser state.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.product_name: Optional[str] = None
+        self._scan_from = 0
+
+    def feed(self, delta: str) -> Optional[str]:
+        """Append a delta and return the product name once it is complete"""
+        self.text += delta
+        if self.product_name is None:
+            key = self.text.find("product_name", self._scan_from)
+            if key == -1:
+                # Keep enough tail to catch a key split across deltas
+                self._scan_from = max(0, len(self.text) - len("product_name"))
+                return None
+            self._scan_from = max(0, key - 1)
+            self.product_name = extract_product_name(self.text[self._scan_from:])
+        return self.product_name
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+from urllib.parse import urljoin
+
+import requests
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+
+class RedirectResolver:
+    """
+    Resolve citation redirect URLs concurrently, with a persistent SQLite cache.
+
+    Each URL costs one HEAD request without following redirects: the first
+    hop's Location is the destination, so no page body is downloaded.
+    Servers that reject HEAD get a streamed GET that is closed before the
+    body is read. Failures fall back to the original URL and are not cached.
+    Background resolution runs on its own small pool so it never queues
+    ahead of resolve_many on the request path.
+    """
+
+    def __init__(self, cache_path: str, max_workers: int = 8, timeout: float = 5.0,
+                 ttl: float = 30 * 86400.0, max_entries: int = 100000, background_workers: int = 2):
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="redirect")
+        self._background_executor = ThreadPoolExecutor(max_workers=background_workers,
+                                                       thread_name_prefix="redirect-background")
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS redirects ("
+            " url TEXT PRIMARY KEY,"
+            " final_url TEXT NOT NULL,"
+            " resolved_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS redirects_resolved_at ON redirects (resolved_at)")
+        self._conn.commit()
+
+    def cached(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT final_url, resolved_at FROM redirects WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        return row[0]
+
+    def _store(self, url: str, final_url: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO redirects (url, final_url, resolved_at) VALUES (?, ?, ?)",
+                (url, final_url, time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM redirects WHERE url IN ("
+                " SELECT url FROM redirects ORDER BY resolved_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def _first_hop(self, url: str) -> str:
+        response = self._session.head(url, allow_redirects=False, timeout=self.timeout)
+        if response.status_code in (405, 501):
+            response = self._session.get(url, allow_redirects=False, timeout=self.timeout, stream=True)
+            response.close()
+        location = response.headers.get('Location')
+        if response.status_code in REDIRECT_STATUSES and location:
+            return urljoin(url, location)
+        return url
+
+    def resolve(self, url: str) -> str:
+        """Return the redirect destination of a URL, or the URL itself"""
+        final_url = self.cached(url)
+        if final_url is not None:
+            return final_url
+        try:
+            final_url = self._first_hop(url)
+        except requests.RequestException as e:
+            print(f"Error resolving URL: {url} -> {e}")
+            return url
+        self._store(url, final_url)
+        return final_url
+
+    def resolve_many(self, urls: Iterable[str]) -> List[str]:
+        """Resolve URLs concurrently, preserving order"""
+        return list(self._executor.map(self.resolve, urls))
+
+    def resolve_later(self, urls: Iterable[str]):
+        """Resolve URLs in the background so later lookups hit the cache"""
+        for url in urls:
+            self._background_executor.submit(self.resolve, url)
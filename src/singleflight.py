@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for and share its result. Non-None results are then kept in
+    a small LRU for `result_ttl` seconds so a burst arriving just after the
+    call finished is served too; with `result_ttl` <= 0 nothing is kept.
+    """
+
+    def __init__(self, result_ttl: float = 30.0, max_results: int = 1024):
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._results: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.stats = {'calls': 0, 'shared': 0, 'cached': 0}
+
+    def _cached(self, key: Hashable):
+        item = self._results.get(key)
+        if item is None:
+            return None
+        value, stored_at = item
+        if time.time() - stored_at >= self.result_ttl:
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return item
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn() once per key among concurrent callers and return its result"""
+        return self.do_leader(key, fn)[0]
+
+    def do_leader(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Like do, but also report whether this caller ran fn()
+
+        Lets callers run side effects of the result, such as persisting it,
+        exactly once instead of once per coalesced caller.
+        """
+        with self._lock:
+            cached = self._cached(key)
+            if cached is not None:
+                self.stats['cached'] += 1
+                return cached[0], False
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.stats['calls'] += 1
+            else:
+                self.stats['shared'] += 1
+
+        if not leader:
+            return future.result(), False
+
+        try:
+            value = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            # Failures (None) are shared with waiters but not cached
+            if value is not None and self.result_ttl > 0:
+                self._results[key] = (value, time.time())
+                self._results.move_to_end(key)
+                while len(self._results) > self.max_results:
+                    self._results.popitem(last=False)
+            del self._in_flight[key]
+        future.set_result(value)
+        return value, True
@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
+
+from text_utils import CHARS_PER_TOKEN, estimate_tokens
+
+SUMMARY_PROMPT = "Please provide a concise summary of this video transcript:\n\n{text}"
+CHUNK_PROMPT = (
+    "This is part {part} of {total} of a video transcript. "
+    "Summarize the key points of this part concisely, keeping product names, numbers and verdicts:\n\n{text}"
+)
+REDUCE_PROMPT = (
+    "These are summaries of consecutive parts of one video transcript. "
+    "Combine them into a single concise summary of the whole video:\n\n{text}"
+)
+CONDENSE_PROMPT = (
+    "This is a summary of part {part} of {total} of a video transcript. "
+    "Shorten it to its most important points, keeping product names, numbers and verdicts:\n\n{text}"
+)
+
+
+def chunk_texts(texts: List[str], max_tokens: int) -> List[str]:
+    """
+    Pack consecutive texts into chunks of at most `max_tokens` estimated tokens
+
+    A single text longer than the budget becomes its own chunk rather than
+    being split mid-sentence.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text at a word boundary to at most about `max_tokens` estimated tokens"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max(0, max_tokens - 1) * CHARS_PER_TOKEN]
+    return cut.rsplit(" ", 1)[0] if " " in cut else cut
+
+
+class MapReduceSummarizer:
+    """
+    Hierarchical summarizer for texts longer than one model context.
+
+    Chunks are summarized concurrently on a bounded thread pool (map), then
+    the partial summaries are merged (reduce), recursing while the merged
+    summaries still exceed the chunk budget.
+    """
+
+    def __init__(self, complete_fn: Callable[[str], str], chunk_tokens: int = 6000,
+                 max_parallelism: int = 4,
+                 progress_callback: Optional[Callable[[str, int, int], None]] = None):
+        """
+        Args:
+            complete_fn: Sends a prompt to the LLM and returns the response text
+            chunk_tokens (int): Token budget per chunk sent to the model
+            max_parallelism (int): Maximum number of concurrent LLM calls
+            progress_callback: Called as (stage, completed, total) as chunks finish;
+                an exception it raises (e.g. the client went away) aborts the summary
+        """
+        self.complete_fn = complete_fn
+        self.chunk_tokens = chunk_tokens
+        self.max_parallelism = max_parallelism
+        self.progress_callback = progress_callback
+
+    def _report(self, stage: str, completed: int, total: int):
+        if self.progress_callback:
+            self.progress_callback(stage, completed, total)
+
+    def _map(self, chunks: List[str], prompt: str, stage: str) -> List[str]:
+        """Summarize chunks concurrently, preserving their order"""
+        results = [None] * len(chunks)
+        self._report(stage, 0, len(chunks))
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_parallelism, len(chunks)))) as executor:
+            futures = {
+                executor.submit(self.complete_fn, prompt.format(part=i + 1, total=len(chunks), text=chunk)): i
+                for i, chunk in enumerate(chunks)
+            }
+            try:
+                for completed, future in enumerate(as_completed(futures), start=1):
+                    results[futures[future]] = future.result()
+                    self._report(stage, completed, len(chunks))
+            except BaseException:
+                # Don't start chunks nobody will use; running calls still finish
+                for future in futures:
+                    future.cancel()
+                raise
+        return results
+
+    def _final_prompt(self, texts: List[str]) -> Tuple[str, bool]:
+        """final_prompt, plus whether the map and reduce steps ran"""
+        chunks = chunk_texts(texts, self.chunk_tokens)
+        if len(chunks) <= 1:
+            return SUMMARY_PROMPT.format(text=" ".join(texts)), False
+
+        summaries = self._map(chunks, CHUNK_PROMPT, "map")
+        level = 1
+        condensed = False
+        while True:
+            groups = chunk_texts(summaries, self.chunk_tokens)
+            if len(groups) == 1 and estimate_tokens(groups[0]) <= self.chunk_tokens:
+                return REDUCE_PROMPT.format(text="\n\n".join(summaries)), True
+            if len(groups) < len(summaries):
+                summaries = self._map(groups, REDUCE_PROMPT, f"reduce-{level}")
+                level += 1
+            elif not condensed:
+                # Every summary is over half the budget, so none can be
+                # merged: condense each one on its own first
+                summaries = self._map(summaries, CONDENSE_PROMPT, "condense")
+                condensed = True
+            else:
+                # Still too long: truncate so at least two fit per prompt,
+                # which guarantees the next reduce level shrinks
+                summaries = [truncate_to_tokens(summary, self.chunk_tokens // 2) for summary in summaries]
+
+    def final_prompt(self, texts: List[str]) -> str:
+        """
+        Run the map and intermediate reduce levels, returning the last prompt
+
+        Short inputs skip the map step entirely and produce the plain
+        single-call summary prompt. The returned prompt stays within the
+        chunk budget: partial summaries too long to merge are condensed one
+        by one, then truncated if they still do not fit.
+        """
+        return self._final_prompt(texts)[0]
+
+    def summarize(self, texts: List[str]) -> str:
+        """Summarize a list of text pieces (e.g. transcript lines)"""
+        prompt, reduced = self._final_prompt(texts)
+        summary = self.complete_fn(prompt)
+        if reduced:
+            self._report("reduce", 1, 1)
+        return summary
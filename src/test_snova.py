@@ -3,8 +3,10 @@ from datetime import datetime
 import base64
 from dotenv import load_dotenv
 import asyncio
-import aiohttp
+from http_client import http_client
 import json
+from typing import Optional
+from product_extract import ProductNameExtractor
 
 load_dotenv()
 
@@ -46,22 +48,22 @@ async def summarize_text(text: str) -> str:
     }
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.sambanova.ai/v1/chat/completions",
-                headers=headers,
-                json=payload
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"API request failed with status {response.status}: {error_text}")
-                
-                response_text = await response.text()
-                data = json.loads(response_text)
-                if 'choices' in data and len(data['choices']) > 0:
-                    return data['choices'][0]['message']['content']
-                return "No summary generated"
-                
+        async with http_client.request(
+            "POST",
+            "https://api.sambanova.ai/v1/chat/completions",
+            headers=headers,
+            json=payload
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"API request failed with status {response.status}: {error_text}")
+            
+            response_text = await response.text()
+            data = json.loads(response_text)
+            if 'choices' in data and len(data['choices']) > 0:
+                return data['choices'][0]['message']['content']
+            return "No summary generated"
+            
     except Exception as e:
         return f"Error generating summary: {str(e)}"
 
@@ -83,26 +85,38 @@ def get_latest_screenshot():
     )
     return os.path.join(SCREENSHOTS_DIR, latest_screenshot)
 
-async def analyze_image() -> str:
+async def analyze_image(image_base64: Optional[str] = None, mime_type: str = "image/png",
+                        stop_on_product_name: bool = True) -> str:
     """
     Analyze an image using SambaNova's Vision API
+
+    The response is streamed; with `stop_on_product_name` the stream is
+    closed as soon as a complete product_name value has arrived, and the
+    text received so far is returned.
+
+    Args:
+        image_base64 (str, optional): Base64-encoded image, forwarded as is.
+            If omitted, the latest screenshot on disk is analyzed.
+        mime_type (str): MIME type of the encoded image
+        stop_on_product_name (bool): Stop reading once the product name is complete
     """
 
-    latest_screenshot_path = get_latest_screenshot()
-    mod_time = datetime.fromtimestamp(os.path.getmtime(latest_screenshot_path))
-    print(f"Found latest screenshot: {latest_screenshot_path}")
-    print(f"Last modified: {mod_time}")
-    
-    # Read and encode the image
-    with open(latest_screenshot_path, "rb") as image_file:
-        image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
+    if image_base64 is None:
+        latest_screenshot_path = get_latest_screenshot()
+        mod_time = datetime.fromtimestamp(os.path.getmtime(latest_screenshot_path))
+        print(f"Found latest screenshot: {latest_screenshot_path}")
+        print(f"Last modified: {mod_time}")
+
+        # Read and encode the image
+        with open(latest_screenshot_path, "rb") as image_file:
+            image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
     headers = {
         "Authorization": f"Bearer {SAMBANOVA_API_KEY}",
         "Content-Type": "application/json"
     }
     
     payload = {
-        "stream": False,
+        "stream": True,
         "model": "Llama-3.2-11B-Vision-Instruct",
         "messages": [
             {
@@ -115,7 +129,7 @@ async def analyze_image() -> str:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/png;base64,{image_base64}"
+                            "url": f"data:{mime_type};base64,{image_base64}"
                         }
                     }
                 ]
@@ -124,40 +138,43 @@ async def analyze_image() -> str:
     }
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.sambanova.ai/v1/chat/completions",
-                headers=headers,
-                json=payload
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"API request failed with status {response.status}: {error_text}")
-                
-                analysis = ""
-                async for line in response.content:
-                    if line:
-                        try:
-                            # Decode bytes to string and remove 'data: ' prefix
-                            line_str = line.decode('utf-8').strip()
-                            if not line_str or line_str == "data: [DONE]":  # Skip empty lines and end marker
-                                continue
-                                
-                            # Remove the 'data: ' prefix
-                            if line_str.startswith("data: "):
-                                line_str = line_str[6:]  # Skip "data: "
-                            
-                            print(f"Processing JSON: {line_str}")  # Debug print
-                            
-                            data = json.loads(line_str)
-                            if 'choices' in data and len(data['choices']) > 0:
-                                content = data['choices'][0]['message']['content']
-                                analysis += content
-                        except json.JSONDecodeError as e:
-                            print(f"Skipping malformed line: {line_str}")
-                            continue
-                
-                return analysis.strip()
+        async with http_client.request(
+            "POST",
+            "https://api.sambanova.ai/v1/chat/completions",
+            headers=headers,
+            json=payload
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"API request failed with status {response.status}: {error_text}")
+            
+            extractor = ProductNameExtractor()
+            async for line in response.content:
+                # Decode bytes to string and skip keep-alives and the end marker
+                line_str = line.decode('utf-8').strip()
+                if not line_str or line_str == "data: [DONE]":
+                    continue
+                if line_str.startswith("data: "):
+                    line_str = line_str[6:]
+
+                try:
+                    data = json.loads(line_str)
+                except json.JSONDecodeError:
+                    print(f"Skipping malformed line: {line_str}")
+                    continue
+
+                if 'choices' not in data or not data['choices']:
+                    continue
+                choice = data['choices'][0]
+                # Streamed chunks carry 'delta'; a non-streaming reply carries 'message'
+                content = (choice.get('delta') or choice.get('message') or {}).get('content') or ""
+                if extractor.feed(content) and stop_on_product_name:
+                    # Drop the connection instead of reading the rest of the reply
+                    response.close()
+                    break
+
+            analysis = extractor.text
+            return analysis.strip()
     except Exception as e:
         return f"Error analyzing image: {str(e)}"
 
@@ -176,6 +193,8 @@ async def main():
         
     except Exception as e:
         print(f"Error: {str(e)}")
+    finally:
+        await http_client.close()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,25 @@
+import re
+
+# Rough token estimate for English text; good enough for budgeting chunks
+CHARS_PER_TOKEN = 4
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def collapse_whitespace(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Lowercase, drop punctuation and collapse whitespace
+
+    Near-identical questions share a single-flight key this way, and product
+    names the key of their cached results, catalog entries and review chunks.
+    """
+    return collapse_whitespace(_PUNCTUATION.sub(" ", query.lower()))
@@ -0,0 +1,109 @@
+from typing import Dict, Iterable, Iterator
+
+import numpy as np
+
+from transcript_index import format_timestamp
+
+
+class Transcript:
+    """
+    Compact, array-backed transcript.
+
+    Start times and durations are float32 arrays and caption text is one
+    UTF-8 byte buffer addressed by offsets, instead of one dict per caption
+    line. Indexing or iterating yields entries shaped like the old dicts
+    ('timestamp', 'text', 'start', 'duration'), built on access, so existing
+    callers keep working. The arrays may be memory-mapped slices of a
+    TranscriptStore.
+    """
+
+    __slots__ = ('starts', 'durations', '_text', '_offsets')
+
+    def __init__(self, starts: np.ndarray, durations: np.ndarray, text: np.ndarray, offsets: np.ndarray):
+        """
+        Args:
+            starts: float32 start times, one per line
+            durations: float32 durations, one per line
+            text: uint8 buffer holding the UTF-8 text of every line
+            offsets: Byte offsets into `text`, one per line plus the end offset
+        """
+        self.starts = starts
+        self.durations = durations
+        self._text = text
+        self._offsets = offsets
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict]) -> "Transcript":
+        """Build a transcript from dicts with 'start', 'duration' and 'text'"""
+        starts = []
+        durations = []
+        encoded = []
+        offsets = [0]
+        for entry in entries:
+            data = entry['text'].encode('utf-8')
+            starts.append(entry['start'])
+            durations.append(entry['duration'])
+            encoded.append(data)
+            offsets.append(offsets[-1] + len(data))
+        return cls(
+            np.asarray(starts, dtype=np.float32),
+            np.asarray(durations, dtype=np.float32),
+            np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            np.asarray(offsets, dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def text_at(self, i: int) -> str:
+        return self._text[int(self._offsets[i]):int(self._offsets[i + 1])].tobytes().decode('utf-8')
+
+    def texts(self) -> Iterator[str]:
+        """Iterate caption text only, without building entry dicts"""
+        for i in range(len(self)):
+            yield self.text_at(i)
+
+    def text_bytes(self) -> bytes:
+        """Return the UTF-8 text of every line as one contiguous buffer"""
+        return self._text[int(self._offsets[0]):int(self._offsets[-1])].tobytes()
+
+    def line_offsets(self) -> np.ndarray:
+        """Return per-line byte offsets relative to text_bytes()"""
+        return self._offsets[:-1] - self._offsets[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                raise ValueError("Transcript slices must be contiguous")
+            stop = max(start, stop)
+            return Transcript(self.starts[start:stop], self.durations[start:stop],
+                              self._text, self._offsets[start:stop + 1])
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Transcript index out of range")
+        start = float(self.starts[i])
+        return {
+            'timestamp': format_timestamp(start),
+            'text': self.text_at(i),
+            'start': start,
+            'duration': float(self.durations[i])
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def to_entries(self):
+        """Materialize the transcript as a list of entry dicts"""
+        return list(self)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the transcript's arrays"""
+        return (self.starts.nbytes + self.durations.nbytes + self._offsets.nbytes
+                + int(self._offsets[-1] - self._offsets[0]))
@@ -0,0 +1,153 @@
+import re
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bm25 import BM25Index
+
+# Matches H:MM:SS, MM:SS or M:SS, optionally with fractional seconds,
+# wherever it appears in a line (bracketed or not)
+TIMESTAMP_PATTERN = re.compile(r"(?<![\d:])(?:(\d{1,2}):)?(\d{1,3}):(\d{2})(?:\.\d+)?(?![\d:])")
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as a [MM:SS] timestamp, or [H:MM:SS] past the first hour"""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"[{hours}:{minutes:02d}:{seconds:02d}]"
+    return f"[{minutes:02d}:{seconds:02d}]"
+
+
+def parse_timestamp(text: str) -> Optional[Tuple[float, int]]:
+    """
+    Find the first timestamp in a line of text
+
+    Accepts [H:MM:SS], [MM:SS] and minute counts past 59 (e.g. [75:10]),
+    with or without brackets.
+
+    Returns:
+        Tuple[float, int]: Seconds and the index just past the timestamp, or None
+    """
+    match = TIMESTAMP_PATTERN.search(text)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    if int(seconds) >= 60:
+        return None
+    total = int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+    end = match.end()
+    if end < len(text) and text[end] in ')]':
+        end += 1
+    return float(total), end
+
+
+class StartTimeIndex:
+    """Sorted segment start times with bisect-based lookup"""
+
+    def __init__(self, starts: Sequence[float]):
+        self.starts = list(starts)
+
+    def locate(self, seconds: float) -> Optional[int]:
+        """
+        Return the position of the last segment starting at or before `seconds`
+
+        Timestamps before the first segment map to the first segment.
+        """
+        if not self.starts:
+            return None
+        return max(bisect_right(self.starts, seconds) - 1, 0)
+
+
+def build_segments(transcript, window_seconds: float = 30.0) -> List[Dict]:
+    """
+    Group consecutive caption lines into time windows
+
+    Args:
+        transcript: Iterable of transcript entries with 'start', 'duration', 'text'
+        window_seconds (float): Approximate length of each segment
+
+    Returns:
+        List[Dict]: Segments with 'start', 'end', 'text'
+    """
+    segments = []
+    current = None
+    for entry in transcript:
+        start = float(entry['start'])
+        end = start + float(entry['duration'])
+        if current is None or start - current['start'] >= window_seconds:
+            current = {'start': start, 'end': end, 'lines': []}
+            segments.append(current)
+        current['end'] = max(current['end'], end)
+        current['lines'].append(entry['text'])
+
+    for segment in segments:
+        segment['text'] = " ".join(segment.pop('lines')).replace("\n", " ")
+    return segments
+
+
+class TranscriptIndex:
+    """
+    Search index over time-windowed transcript segments for a single video.
+
+    Combines BM25 lexical scores with cosine similarity of embedding vectors
+    when an embedding function is available; falls back to BM25 alone.
+    """
+
+    def __init__(self, transcript, window_seconds: float = 30.0,
+                 embed_fn: Optional[Callable[[List[str], str], List[List[float]]]] = None,
+                 vector_weight: float = 0.5):
+        self.segments = build_segments(transcript, window_seconds)
+        self.window_seconds = window_seconds
+        self.bm25 = BM25Index([s['text'] for s in self.segments])
+        self.start_index = StartTimeIndex([s['start'] for s in self.segments])
+        self.embed_fn = embed_fn
+        self.vector_weight = vector_weight
+        self.vectors = None
+
+        if embed_fn and self.segments:
+            try:
+                vectors = np.asarray(embed_fn([s['text'] for s in self.segments], 'retrieval_document'),
+                                     dtype=np.float32)
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                self.vectors = vectors / np.maximum(norms, 1e-12)
+            except Exception as e:
+                print(f"Error embedding transcript segments, using BM25 only: {str(e)}")
+
+    def segment_at(self, seconds: float) -> Optional[Dict]:
+        """Return the segment covering a timestamp, tolerating near misses"""
+        pos = self.start_index.locate(seconds)
+        if pos is None:
+            return None
+        segment = self.segments[pos]
+        if not (segment['start'] - self.window_seconds <= seconds <= segment['end'] + self.window_seconds):
+            return None
+        return segment
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """Return the top-k segments for a query, each with a 'score'"""
+        if not self.segments:
+            return []
+
+        scores = np.zeros(len(self.segments), dtype=np.float32)
+        bm25_scores = self.bm25.scores(query)
+        if bm25_scores:
+            max_score = max(bm25_scores.values())
+            for doc_id, score in bm25_scores.items():
+                scores[doc_id] = score / max_score
+
+        if self.vectors is not None:
+            try:
+                query_vector = np.asarray(self.embed_fn([query], 'retrieval_query')[0], dtype=np.float32)
+                query_vector /= max(np.linalg.norm(query_vector), 1e-12)
+                similarities = self.vectors @ query_vector
+                scores = (1 - self.vector_weight) * scores + self.vector_weight * similarities
+            except Exception as e:
+                print(f"Error embedding query, using BM25 only: {str(e)}")
+
+        k = min(k, len(self.segments))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{**self.segments[i], 'score': float(scores[i])} for i in top if scores[i] > 0]
@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: fall back to msvcrt byte-range locks
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+
+from transcript import Transcript
+
+STARTS_FILE = "starts.f32"
+DURATIONS_FILE = "durations.f32"
+OFFSETS_FILE = "offsets.u64"
+TEXT_FILE = "text.bin"
+# Legacy whole-file index, read once if present; new entries go to the log
+INDEX_FILE = "index.json"
+INDEX_LOG_FILE = "index.log"
+LOCK_FILE = "store.lock"
+
+
+class _FileLock:
+    """
+    Inter-process lock on a file: flock on POSIX, msvcrt.locking on Windows
+
+    msvcrt has no shared mode, so on Windows readers take the exclusive lock too.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, 'a+')
+
+    @contextmanager
+    def hold(self, exclusive: bool):
+        fd = self._file.fileno()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        else:
+            self._file.seek(0)
+            while True:
+                try:
+                    # LK_LOCK itself gives up after ~10 seconds
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def close(self):
+        self._file.close()
+
+
+class TranscriptStore:
+    """
+    Append-only columnar store for many video transcripts.
+
+    Start times and durations are float32 columns, caption text is one UTF-8
+    buffer with a uint64 start offset per line, and an append-only JSON-lines
+    index log maps each video ID to its row range. Columns are memory-mapped
+    for reads, so serving a stored transcript costs no parsing and little
+    resident memory.
+
+    Several processes (the API server and the ingest CLI) may share one
+    directory: writes hold an exclusive file lock and first catch up with
+    index entries other processes have appended.
+    """
+
+    def __init__(self, directory: str = "transcript_store"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._file_lock = _FileLock(self._path(LOCK_FILE))
+        self._index = self._load_index()
+        self._rows, self._text_bytes = self._end_positions()
+        self._log_offset = 0
+        with self._file_lock.hold(exclusive=False):
+            self._refresh()
+        self._maps = {}
+        self._mapped_rows = -1
+        self._mapped_bytes = -1
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load_index(self) -> Dict[str, dict]:
+        path = self._path(INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _refresh(self):
+        """Read index entries appended to the log since the last call"""
+        path = self._path(INDEX_LOG_FILE)
+        if not os.path.exists(path) or os.path.getsize(path) <= self._log_offset:
+            return
+        with open(path, 'rb') as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        # A line without its newline is an interrupted write; ignore it
+        complete = data[:data.rfind(b'\n') + 1]
+        for line in complete.splitlines():
+            record = json.loads(line)
+            video_id = record.pop('video_id')
+            self._index[video_id] = record
+            self._rows = max(self._rows, record['row'] + record['count'])
+            self._text_bytes = max(self._text_bytes, record['text_end'])
+        self._log_offset += len(complete)
+
+    def _log_entry(self, video_id: str, record: dict):
+        """Append one index entry, dropping any interrupted line before it"""
+        line = json.dumps({'video_id': video_id, **record}) + '\n'
+        self._append(INDEX_LOG_FILE, line.encode('utf-8'), self._log_offset)
+        self._log_offset += len(line.encode('utf-8'))
+
+    def _end_positions(self):
+        """Return (rows, text bytes) covered by the loaded index"""
+        rows = 0
+        text_bytes = 0
+        for record in self._index.values():
+            rows = max(rows, record['row'] + record['count'])
+            text_bytes = max(text_bytes, record['text_end'])
+        return rows, text_bytes
+
+    def _map(self, name: str, dtype, length: int):
+        if not length:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode='r', shape=(length,))
+
+    def _columns(self):
+        """Memory-map the columns, remapping only after the files have grown"""
+        rows, text_bytes = self._rows, self._text_bytes
+        if rows != self._mapped_rows or text_bytes != self._mapped_bytes:
+            self._maps = {
+                'starts': self._map(STARTS_FILE, np.float32, rows),
+                'durations': self._map(DURATIONS_FILE, np.float32, rows),
+                'offsets': self._map(OFFSETS_FILE, np.uint64, rows),
+                'text': self._map(TEXT_FILE, np.uint8, text_bytes),
+            }
+            self._mapped_rows = rows
+            self._mapped_bytes = text_bytes
+        return self._maps
+
+    def __contains__(self, video_id: str) -> bool:
+        with self._lock:
+            if video_id not in self._index:
+                with self._file_lock.hold(exclusive=False):
+                    self._refresh()
+            return video_id in self._index
+
+    def __len__(self) -> int:
+        with self._lock:
+            with self._file_lock.hold(exclusive=False):
+                self._refresh()
+            return len(self._index)
+
+    def put(self, video_id: str, transcript) -> bool:
+        """
+        Append a transcript; transcripts already stored are left untouched
+
+        Args:
+            video_id (str): YouTube video ID
+            transcript: Transcript, or iterable of entries with 'start', 'duration' and 'text'
+
+        Returns:
+            bool: True if the transcript was written
+        """
+        if not isinstance(transcript, Transcript):
+            transcript = Transcript.from_entries(transcript)
+
+        with self._lock, self._file_lock.hold(exclusive=True):
+            # Another process may have appended since we last looked
+            self._refresh()
+            if video_id in self._index:
+                return False
+
+            row, text_start = self._rows, self._text_bytes
+            text = transcript.text_bytes()
+            offsets = transcript.line_offsets().astype(np.uint64) + np.uint64(text_start)
+            position = text_start + len(text)
+
+            # Columns are written before the index, so a crash mid-write only
+            # leaves unreferenced bytes behind. Under the lock the index is
+            # current, so truncating to the indexed size drops only such
+            # leftovers, never another writer's data.
+            for name, values in ((STARTS_FILE, np.asarray(transcript.starts, dtype=np.float32)),
+                                 (DURATIONS_FILE, np.asarray(transcript.durations, dtype=np.float32)),
+                                 (OFFSETS_FILE, offsets)):
+                self._append(name, values.tobytes(), row * values.itemsize)
+            self._append(TEXT_FILE, text, text_start)
+
+            record = {
+                'row': row,
+                'count': len(transcript),
+                'text_end': position,
+            }
+            self._log_entry(video_id, record)
+            self._index[video_id] = record
+            self._rows = row + len(transcript)
+            self._text_bytes = position
+            return True
+
+    def _append(self, name: str, data: bytes, expected_size: int):
+        path = self._path(name)
+        with open(path, 'ab') as f:
+            if f.tell() != expected_size:
+                f.truncate(expected_size)
+                f.seek(expected_size)
+            f.write(data)
+
+    def get(self, video_id: str) -> Optional[Transcript]:
+        """Return a stored transcript backed by the memory-mapped columns, or None"""
+        with self._lock:
+            if video_id not in self._index:
+                with self._file_lock.hold(exclusive=False):
+                    self._refresh()
+            record = self._index.get(video_id)
+            if record is None:
+                return None
+            columns = self._columns()
+
+        row, count = record['row'], record['count']
+        offsets = np.append(columns['offsets'][row:row + count].astype(np.int64), record['text_end'])
+        return Transcript(
+            columns['starts'][row:row + count],
+            columns['durations'][row:row + count],
+            columns['text'],
+            offsets,
+        )
+
+    def close(self):
+        """Release the lock file and column maps; transcripts already returned stay readable"""
+        with self._lock:
+            self._file_lock.close()
+            self._maps = {}
+            self._mapped_rows = -1
+            self._mapped_bytes = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,364 @@
+import abc
+import atexit
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from bm25 import BM25Index
+from text_utils import normalize_query
+
+VECTORS_FILE = "vectors.{dtype}"
+META_FILE = "meta.jsonl"
+INDEX_FILE = "index.json"
+
+# Rows scored per block, bounding the float32 working copy of a float16 matrix
+SCORE_BLOCK_ROWS = 65536
+# Hybrid search fuses this many candidates per k from each ranking
+HYBRID_CANDIDATE_FACTOR = 4
+# Standard reciprocal-rank-fusion damping constant
+RRF_K = 60
+
+
+class VectorStore(abc.ABC):
+    """
+    Interface of the review vector stores.
+
+    Rows are review chunks keyed by (normalized product name, chunk_hash)
+    with their embedding; the same normalized name is what `product_name`
+    filters match, so spelling variants of a product share rows. Search
+    returns dicts with 'product_name', 'review_context', 'chunk_hash' and a
+    cosine 'score', best first.
+    """
+
+    @abc.abstractmethod
+    def missing(self, product_name: str, hashes: Sequence[str]) -> List[int]:
+        """Indexes of the hashes not stored yet for this product"""
+
+    @abc.abstractmethod
+    def add(self, product_name: str, texts: Sequence[str], hashes: Sequence[str],
+            embeddings: Sequence[Sequence[float]]) -> int:
+        """Store new chunks, skipping known keys; returns the number added"""
+
+    @abc.abstractmethod
+    def search(self, embedding: Sequence[float], k: int = 5,
+               product_name: Optional[str] = None) -> List[dict]:
+        """The k rows nearest to the embedding, optionally only one product's"""
+
+    @abc.abstractmethod
+    def hybrid_search(self, query: str, embedding: Sequence[float], k: int = 5,
+                      product_name: Optional[str] = None) -> List[dict]:
+        """
+        BM25 and vector rankings of the same rows fused with reciprocal-rank fusion
+
+        With `product_name`, only that product's rows are scored. 'score' is
+        the fused RRF score.
+        """
+
+    def flush(self):
+        """Make pending writes durable"""
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence], k: int = RRF_K) -> List[tuple]:
+    """Fuse ranked lists of keys into (key, score) pairs, best first"""
+    scores: Dict = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index: k-means centroids, each with a list of row ids.
+
+    A query scores the `probes` nearest centroids' rows only. Vectors are
+    expected to be unit length, so dot products are cosine similarities.
+    """
+
+    def __init__(self, matrix: np.ndarray, n_lists: int, probes: int = 8,
+                 iterations: int = 10, sample_size: int = 50000, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        rows = matrix.shape[0]
+        sample = np.asarray(matrix[np.sort(rng.choice(rows, min(rows, sample_size), replace=False))],
+                            dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(n_lists):
+                members = sample[assignment == i]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[i] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        self.centroids = centroids
+        self.probes = probes
+        self.lists: List[List[int]] = [[] for _ in range(n_lists)]
+        self.rows = 0
+        self.extend(matrix)
+
+    def extend(self, matrix: np.ndarray):
+        """Assign rows added since the last call to their nearest centroid"""
+        for start in range(self.rows, matrix.shape[0], SCORE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            for offset, list_id in enumerate(np.argmax(block @ self.centroids.T, axis=1)):
+                self.lists[list_id].append(start + offset)
+        self.rows = matrix.shape[0]
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        nearest = _top_k(self.centroids @ query, self.probes)
+        return np.sort(np.concatenate([np.asarray(self.lists[i], dtype=np.int64) for i in nearest]))
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Append-only local vector store.
+
+    Embeddings are normalized to unit length and appended to one float32 or
+    float16 file that is memory-mapped for queries; chunk metadata goes to a
+    JSON-lines file and a small JSON index records the committed row count.
+    Search is an exact, vectorized matrix-vector product with argpartition
+    top-k. With `ann` enabled, collections of at least `ann_min_rows` rows
+    are searched through an IVF index instead.
+    """
+
+    def __init__(self, directory: str = "vector_store", dtype: str = "float32", ann: bool = False,
+                 ann_min_rows: int = 50000, ann_probes: int = 8):
+        self.directory = directory
+        self.ann = ann
+        self.ann_min_rows = ann_min_rows
+        self.ann_probes = ann_probes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+
+        index = self._load_index()
+        self.dtype = np.dtype(index.get('dtype', dtype))
+        self.dim = index.get('dim')
+        self._rows = index.get('rows', 0)
+        self._meta_bytes = index.get('meta_bytes', 0)
+        self._matrix = None
+        self._ivf: Optional[IVFIndex] = None
+
+        self._products: List[str] = []
+        self._texts: List[str] = []
+        self._hashes: List[str] = []
+        self._keys = set()
+        self._product_rows: Dict[str, List[int]] = {}
+        # BM25 index and its row ids per product key (None: all rows), built on
+        # first use and then extended in place as rows are added
+        self._bm25: Dict[Optional[str], tuple] = {}
+        self._load_meta()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @property
+    def _vectors_file(self) -> str:
+        return VECTORS_FILE.format(dtype='f16' if self.dtype == np.float16 else 'f32')
+
+    def _load_index(self) -> dict:
+        path = self._path(INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_index(self):
+        path = self._path(INDEX_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'dim': self.dim, 'dtype': self.dtype.name, 'rows': self._rows,
+                       'meta_bytes': self._meta_bytes}, f)
+        os.replace(tmp_path, path)
+
+    def _load_meta(self):
+        if not self._rows:
+            return
+        with open(self._path(META_FILE), 'rb') as f:
+            lines = f.read(self._meta_bytes).splitlines()
+        for row, line in enumerate(lines[:self._rows]):
+            self._remember(row, json.loads(line))
+
+    def _remember(self, row: int, meta: dict):
+        self._products.append(meta['product_name'])
+        self._texts.append(meta['review_context'])
+        self._hashes.append(meta['chunk_hash'])
+        # Rows written before product keys were stored get theirs from the name
+        product_key = meta.get('product_key') or normalize_query(meta['product_name'])
+        self._keys.add((product_key, meta['chunk_hash']))
+        self._product_rows.setdefault(product_key, []).append(row)
+
+    def _append(self, name: str, data: bytes, expected_size: int):
+        path = self._path(name)
+        with open(path, 'ab') as f:
+            if f.tell() != expected_size:
+                f.truncate(expected_size)
+                f.seek(expected_size)
+            f.write(data)
+
+    def _vectors(self) -> np.ndarray:
+        """Memory-map the vectors, remapping only after the file has grown"""
+        if not self._rows:
+            return np.zeros((0, self.dim or 0), dtype=self.dtype)
+        if self._matrix is None or self._matrix.shape[0] != self._rows:
+            self._matrix = np.memmap(self._path(self._vectors_file), dtype=self.dtype, mode='r',
+                                     shape=(self._rows, self.dim))
+        return self._matrix
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def missing(self, product_name: str, hashes: Sequence[str]) -> List[int]:
+        product_key = normalize_query(product_name)
+        with self._lock:
+            return [i for i, h in enumerate(hashes) if (product_key, h) not in self._keys]
+
+    def add(self, product_name: str, texts: Sequence[str], hashes: Sequence[str],
+            embeddings: Sequence[Sequence[float]]) -> int:
+        product_key = normalize_query(product_name)
+        with self._lock:
+            new = []
+            seen = set()
+            for text, h, embedding in zip(texts, hashes, embeddings):
+                if (product_key, h) in self._keys or h in seen:
+                    continue
+                seen.add(h)
+                new.append((text, h, embedding))
+            if not new:
+                return 0
+
+            vectors = np.asarray([embedding for _, _, embedding in new], dtype=np.float32)
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = (vectors / np.where(norms == 0, 1.0, norms)).astype(self.dtype)
+
+            metas = [{'product_name': product_name, 'product_key': product_key,
+                      'review_context': text, 'chunk_hash': h}
+                     for text, h, _ in new]
+            meta_data = "".join(json.dumps(meta) + "\n" for meta in metas).encode('utf-8')
+
+            # Data files first, then the index, like TranscriptStore
+            self._append(self._vectors_file, vectors.tobytes(), self._rows * self.dim * self.dtype.itemsize)
+            self._append(META_FILE, meta_data, self._meta_bytes)
+            for offset, meta in enumerate(metas):
+                self._remember(self._rows + offset, meta)
+            for key in (product_key, None):
+                if key in self._bm25:
+                    bm25, rows = self._bm25[key]
+                    bm25.add([text for text, _, _ in new])
+                    rows.extend(range(self._rows, self._rows + len(new)))
+            self._rows += len(new)
+            self._meta_bytes += len(meta_data)
+            self._save_index()
+            return len(new)
+
+    def _score(self, matrix: np.ndarray, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dot products of the query with the given rows (all rows if None), block by block"""
+        total = matrix.shape[0] if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, SCORE_BLOCK_ROWS):
+            block = matrix[start:start + SCORE_BLOCK_ROWS] if rows is None else matrix[rows[start:start + SCORE_BLOCK_ROWS]]
+            scores[start:start + SCORE_BLOCK_ROWS] = np.asarray(block, dtype=np.float32) @ query
+        return scores
+
+    def _ann_candidates(self, matrix: np.ndarray, query: np.ndarray) -> Optional[np.ndarray]:
+        if not self.ann or matrix.shape[0] < self.ann_min_rows:
+            return None
+        # Rebuild once the collection has doubled; otherwise just assign new rows
+        if self._ivf is None or matrix.shape[0] > 2 * len(self._ivf.centroids) ** 2:
+            self._ivf = IVFIndex(matrix, n_lists=int(np.sqrt(matrix.shape[0])), probes=self.ann_probes)
+        else:
+            self._ivf.extend(matrix)
+        return self._ivf.candidates(query)
+
+    def search(self, embedding: Sequence[float], k: int = 5,
+               product_name: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            return [self._result(row, score) for row, score in self._vector_top_k(embedding, k, product_name)]
+
+    def _vector_top_k(self, embedding: Sequence[float], k: int, product_name: Optional[str]) -> List[tuple]:
+        """(row, cosine score) of the k nearest rows, best first"""
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            matrix = self._vectors()
+            if product_name is not None:
+                rows = np.asarray(self._product_rows.get(normalize_query(product_name), []), dtype=np.int64)
+            else:
+                rows = self._ann_candidates(matrix, query)
+            scores = self._score(matrix, query, rows)
+            best = _top_k(scores, k)
+            positions = rows[best] if rows is not None else best
+            return [(int(row), float(scores[i])) for i, row in zip(best, positions)]
+
+    def _result(self, row: int, score: float) -> dict:
+        return {
+            'product_name': self._products[row],
+            'review_context': self._texts[row],
+            'chunk_hash': self._hashes[row],
+            'score': float(score),
+        }
+
+    def _bm25_index(self, product_key: Optional[str]) -> tuple:
+        if product_key not in self._bm25:
+            if product_key is None:
+                rows = list(range(self._rows))
+            else:
+                rows = list(self._product_rows.get(product_key, []))
+            self._bm25[product_key] = (BM25Index([self._texts[row] for row in rows]), rows)
+        return self._bm25[product_key]
+
+    def hybrid_search(self, query: str, embedding: Sequence[float], k: int = 5,
+                      product_name: Optional[str] = None) -> List[dict]:
+        candidates = k * HYBRID_CANDIDATE_FACTOR
+        with self._lock:
+            vector_rows = [row for row, _ in self._vector_top_k(embedding, candidates, product_name)]
+            bm25, rows = self._bm25_index(normalize_query(product_name) if product_name is not None else None)
+            lexical_rows = [int(rows[doc_id]) for doc_id, _ in bm25.top_k(query, candidates)]
+            fused = reciprocal_rank_fusion([vector_rows, lexical_rows])[:k]
+            return [self._result(row, score) for row, score in fused]
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """
+    Return the configured vector store
+
+    VECTOR_STORE_BACKEND selects 'deeplake' (the remote dataset, default) or
+    'local' (LocalVectorStore under VECTOR_STORE_DIR, usable offline).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = os.getenv('VECTOR_STORE_BACKEND', 'deeplake').lower()
+            if backend == 'local':
+                _store = LocalVectorStore(
+                    os.getenv('VECTOR_STORE_DIR', 'vector_store'),
+                    dtype=os.getenv('VECTOR_STORE_DTYPE', 'float32'),
+                    ann=os.getenv('VECTOR_STORE_ANN', 'false').lower() in ('1', 'true', 'yes'),
+                    ann_min_rows=int(os.getenv('VECTOR_STORE_ANN_MIN_ROWS', '50000')),
+                    ann_probes=int(os.getenv('VECTOR_STORE_ANN_PROBES', '8'))
+                )
+            else:
+                # Imported here so the local backend runs without deeplake installed
+                from deep_lake_vectordb import DeepLakeVectorStore
+                _store = DeepLakeVectorStore()
+            atexit.register(_store.flush)
+        return _store
@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Default time-to-live per cached field, in seconds. Transcripts practically
+# never change once published, while view/like counts drift within hours.
+DEFAULT_TTLS = {
+    'transcript': 7 * 24 * 3600,
+    'video_info': 3600,
+}
+
+
+class VideoCache:
+    """
+    Per-video cache with LRU eviction, per-field TTLs and an optional disk tier.
+
+    Entries are keyed by video ID; each entry holds several fields (e.g.
+    'transcript', 'video_info') that expire independently. Only fields listed
+    in `persist_fields` are written to the disk tier (by default just metadata;
+    transcripts persist in TranscriptStore), so in-memory-only values such as
+    transcripts and search indexes can share the same entry.
+    """
+
+    def __init__(self, max_videos: int = 256, ttls: Optional[Dict[str, float]] = None,
+                 cache_dir: Optional[str] = None, persist_fields=('video_info',)):
+        self.max_videos = max_videos
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.cache_dir = cache_dir
+        self.persist_fields = set(persist_fields)
+        self._entries: "OrderedDict[str, Dict[str, tuple]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        if self.cache_dir and not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def _is_fresh(self, field: str, stored_at: float) -> bool:
+        ttl = self.ttls.get(field)
+        return ttl is None or (time.time() - stored_at) < ttl
+
+    def _disk_path(self, video_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{video_id}.json")
+
+    def _load_from_disk(self, video_id: str) -> Dict[str, tuple]:
+        if not self.cache_dir:
+            return {}
+        path = self._disk_path(video_id)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {field: (item['value'], item['stored_at']) for field, item in data.items()}
+        except Exception as e:
+            print(f"Error reading cache file {path}: {str(e)}")
+            return {}
+
+    def _write_to_disk(self, video_id: str, entry: Dict[str, tuple]):
+        if not self.cache_dir:
+            return
+        data = {
+            field: {'value': value, 'stored_at': stored_at}
+            for field, (value, stored_at) in entry.items()
+            if field in self.persist_fields
+        }
+        if not data:
+            return
+        path = self._disk_path(video_id)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing cache file {path}: {str(e)}")
+
+    def get(self, video_id: str, field: str) -> Optional[Any]:
+        """Return a fresh cached value, or None on miss/expiry"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                entry = self._load_from_disk(video_id)
+                if not entry:
+                    return None
+                self._entries[video_id] = entry
+                self._evict()
+            self._entries.move_to_end(video_id)
+
+            item = entry.get(field)
+            if item is None:
+                return None
+            value, stored_at = item
+            if not self._is_fresh(field, stored_at):
+                del entry[field]
+                return None
+            return value
+
+    def set(self, video_id: str, field: str, value: Any):
+        """Store a value for a video field and write persisted fields through to disk"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                entry = self._load_from_disk(video_id)
+                self._entries[video_id] = entry
+            entry[field] = (value, time.time())
+            self._entries.move_to_end(video_id)
+            self._evict()
+            if field in self.persist_fields:
+                self._write_to_disk(video_id, entry)
+
+    def invalidate(self, video_id: str, field: Optional[str] = None):
+        """Drop one field, or the whole entry, for a video (memory tier only)"""
+        with self._lock:
+            if field is None:
+                self._entries.pop(video_id, None)
+            elif video_id in self._entries:
+                self._entries[video_id].pop(field, None)
+
+    def _evict(self):
+        while len(self._entries) > self.max_videos:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -4,7 +4,12 @@ import os
 from dotenv import load_dotenv
 import re
 import google.generativeai as genai
-from typing import List, Dict, Optional
+from typing import Callable, Iterable, Iterator, List, Dict, Optional
+from video_cache import VideoCache
+from transcript_index import TranscriptIndex, format_timestamp, parse_timestamp
+from summarizer import MapReduceSummarizer
+from transcript_store import TranscriptStore
+from transcript import Transcript
 
 # Load environment variables
 load_dotenv()
@@ -13,18 +18,70 @@ load_dotenv()
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 genai.configure(api_key=GEMINI_API_KEY)
 model = genai.GenerativeModel('gemini-pro')
+EMBEDDING_MODEL = 'models/text-embedding-004'
+EMBEDDING_BATCH_SIZE = 100
+# How many local candidates per requested result are sent to Gemini when reranking
+RERANK_CANDIDATE_FACTOR = 3
+
+# The Data API accepts at most 50 IDs / results per list call
+MAX_IDS_PER_REQUEST = 50
+# Partial response mask: only the fields _parse_video_item reads
+VIDEO_INFO_FIELDS = (
+    "items(id,snippet(title,description,channelTitle,publishedAt),"
+    "contentDetails(duration),statistics(viewCount,likeCount))"
+)
+
+SUMMARY_MODEL = "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
+# Token budget per summarized chunk; keeps each call well inside the model context
+SUMMARY_CHUNK_TOKENS = 6000
+SUMMARY_MAX_PARALLELISM = 4
+
+
+def embed_texts(texts: List[str], task_type: str) -> List[List[float]]:
+    """Embed texts with Gemini, batching to the API's per-request limit"""
+    embeddings = []
+    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        result = genai.embed_content(
+            model=EMBEDDING_MODEL,
+            content=texts[i : i + EMBEDDING_BATCH_SIZE],
+            task_type=task_type
+        )
+        embeddings += result['embedding']
+    return embeddings
+
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Re-split a stream of text chunks into complete lines"""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        yield from lines
+    if buffer:
+        yield buffer
+
+
+def default_video_cache(store: TranscriptStore) -> VideoCache:
+    """Metadata cache persisted to VIDEO_CACHE_DIR, or next to the transcript store if unset"""
+    return VideoCache(cache_dir=os.getenv('VIDEO_CACHE_DIR') or os.path.join(store.directory, 'video_info'))
+
 
 class YouTubeProcessor:
-    def __init__(self):
+    def __init__(self, cache: Optional[VideoCache] = None, store: Optional[TranscriptStore] = None):
         self.api_key = os.getenv('YOUTUBE_API_KEY')
         self.youtube = build('youtube', 'v3', 
                       developerKey=self.api_key,
                       cache_discovery=False,
                       static_discovery=False)
-        self.transcript_cache = None
-        self.video_info_cache = None
+        # Transcripts persist in the columnar store; the per-video cache
+        # only needs to write metadata, so bulk-fetched video info outlives
+        # the process even when no text export is written
+        self.store = store or TranscriptStore(os.getenv('TRANSCRIPT_STORE_DIR', 'transcript_store'))
+        self.cache = cache or default_video_cache(self.store)
+        self.together_client = None
 
-    def extract_video_id(self, url: str) -> str:
+    @staticmethod
+    def extract_video_id(url: str) -> str:
         """Extract video ID from various forms of YouTube URLs"""
         try:
             patterns = [
@@ -42,168 +99,379 @@ class YouTubeProcessor:
             print(f"Error extracting video ID: {str(e)}")
             return None
 
+    def extract_playlist_id(self, url: str) -> str:
+        """Extract playlist ID from a YouTube playlist URL, or return a bare ID as is"""
+        match = re.search(r'[?&]list=([0-9A-Za-z_-]+)', url)
+        if match:
+            return match.group(1)
+        return url if re.fullmatch(r'[0-9A-Za-z_-]+', url) else None
+
+    def _parse_video_item(self, video_data: dict) -> dict:
+        """Flatten a videos().list item into the video info dict"""
+        return {
+            'title': video_data['snippet']['title'],
+            'description': video_data['snippet']['description'],
+            'channel': video_data['snippet']['channelTitle'],
+            'published_at': video_data['snippet']['publishedAt'],
+            'view_count': video_data['statistics'].get('viewCount', 'N/A'),
+            'like_count': video_data['statistics'].get('likeCount', 'N/A'),
+            'duration': video_data['contentDetails']['duration']
+        }
+
     def get_video_info(self, video_id: str) -> dict:
         """Retrieve video information using YouTube API"""
         try:
-            if self.video_info_cache:
-                return self.video_info_cache
+            cached = self.cache.get(video_id, 'video_info')
+            if cached:
+                return cached
 
             request = self.youtube.videos().list(
                 part="snippet,contentDetails,statistics",
-                id=video_id
+                id=video_id,
+                fields=VIDEO_INFO_FIELDS
             )
             response = request.execute()
 
             if not response['items']:
                 return None
 
-            video_data = response['items'][0]
-            self.video_info_cache = {
-                'title': video_data['snippet']['title'],
-                'description': video_data['snippet']['description'],
-                'channel': video_data['snippet']['channelTitle'],
-                'published_at': video_data['snippet']['publishedAt'],
-                'view_count': video_data['statistics']['viewCount'],
-                'like_count': video_data['statistics'].get('likeCount', 'N/A'),
-                'duration': video_data['contentDetails']['duration']
-            }
-            return self.video_info_cache
+            video_info = self._parse_video_item(response['items'][0])
+            self.cache.set(video_id, 'video_info', video_info)
+            return video_info
         except Exception as e:
             print(f"Error getting video info: {str(e)}")
             return None
 
-    def get_transcript(self, video_id: str) -> List[Dict]:
+    def get_video_info_batch(self, video_ids: List[str]) -> Dict[str, dict]:
+        """
+        Retrieve video information for many videos, 50 IDs per API request
+
+        Args:
+            video_ids (List[str]): YouTube video IDs
+
+        Returns:
+            Dict[str, dict]: Video info by video ID; unavailable videos are omitted
+        """
+        results = {}
+        missing = []
+        for video_id in dict.fromkeys(video_ids):
+            cached = self.cache.get(video_id, 'video_info')
+            if cached:
+                results[video_id] = cached
+            else:
+                missing.append(video_id)
+
+        for i in range(0, len(missing), MAX_IDS_PER_REQUEST):
+            batch = missing[i : i + MAX_IDS_PER_REQUEST]
+            try:
+                response = self.youtube.videos().list(
+                    part="snippet,contentDetails,statistics",
+                    id=",".join(batch),
+                    fields=VIDEO_INFO_FIELDS
+                ).execute()
+                for item in response.get('items', []):
+                    video_info = self._parse_video_item(item)
+                    self.cache.set(item['id'], 'video_info', video_info)
+                    results[item['id']] = video_info
+            except Exception as e:
+                print(f"Error getting video info batch: {str(e)}")
+        return results
+
+    def get_playlist_video_ids(self, playlist_id: str) -> List[str]:
+        """Return the IDs of every video in a playlist, paging 50 at a time"""
+        video_ids = []
+        page_token = None
+        try:
+            while True:
+                response = self.youtube.playlistItems().list(
+                    part="contentDetails",
+                    playlistId=playlist_id,
+                    maxResults=MAX_IDS_PER_REQUEST,
+                    pageToken=page_token,
+                    fields="nextPageToken,items(contentDetails(videoId))"
+                ).execute()
+                video_ids += [item['contentDetails']['videoId'] for item in response.get('items', [])]
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        except Exception as e:
+            print(f"Error listing playlist {playlist_id}: {str(e)}")
+        return video_ids
+
+    def get_channel_video_ids(self, channel: str) -> List[str]:
+        """
+        Return the IDs of every upload on a channel
+
+        Args:
+            channel (str): Channel ID (UC...), @handle or channel URL
+        """
+        try:
+            match = re.search(r'(UC[0-9A-Za-z_-]{22})', channel)
+            if match:
+                lookup = {'id': match.group(1)}
+            else:
+                handle = re.search(r'@([0-9A-Za-z_.-]+)', channel)
+                lookup = {'forHandle': handle.group(1) if handle else channel}
+
+            response = self.youtube.channels().list(
+                part="contentDetails",
+                fields="items(contentDetails(relatedPlaylists(uploads)))",
+                **lookup
+            ).execute()
+            if not response.get('items'):
+                print(f"Channel not found: {channel}")
+                return []
+            uploads = response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+            return self.get_playlist_video_ids(uploads)
+        except Exception as e:
+            print(f"Error listing channel {channel}: {str(e)}")
+            return []
+
+    def get_transcript(self, video_id: str) -> Transcript:
         """Retrieve video transcript with timestamps"""
         try:
-            if self.transcript_cache:
-                return self.transcript_cache
+            cached = self.cache.get(video_id, 'transcript')
+            if cached:
+                return cached
+
+            stored = self.store.get(video_id)
+            if stored is not None:
+                self.cache.set(video_id, 'transcript', stored)
+                return stored
 
             transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-            
-            # Format each transcript entry with timestamp
-            formatted_transcript = []
-            for entry in transcript_list:
-                # Convert duration to minutes and seconds
-                start_seconds = int(entry['start'])
-                minutes = start_seconds // 60
-                seconds = start_seconds % 60
-                
-                # Format timestamp and text
-                timestamp = f"[{minutes:02d}:{seconds:02d}]"
-                formatted_entry = {
-                    'timestamp': timestamp,
-                    'text': entry['text'],
-                    'start': entry['start'],
-                    'duration': entry['duration']
-                }
-                formatted_transcript.append(formatted_entry)
-            
-            self.transcript_cache = formatted_transcript
-            return formatted_transcript
+
+            # Columnar representation; timestamps are formatted on access
+            transcript = Transcript.from_entries(transcript_list)
+            self.store.put(video_id, transcript)
+            self.cache.set(video_id, 'transcript', transcript)
+            return transcript
         except Exception as e:
             print(f"Error getting transcript: {str(e)}")
             return None
 
-    def get_summary(self, video_id: str) -> str:
-        """Generate a summary of the video using Gemini"""
+    def _get_together_client(self):
+        """Create the Together client once and reuse it across calls"""
+        if self.together_client is None:
+            from together import Together
+            self.together_client = Together()
+        return self.together_client
+
+    def _complete(self, prompt: str) -> str:
+        """Send a single prompt to the summary model and return its text"""
+        response = self._get_together_client().chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        return response.choices[0].message.content
+
+    def get_summary(self, video_id: str, max_parallelism: int = SUMMARY_MAX_PARALLELISM,
+                    progress_callback: Optional[Callable[[str, int, int], None]] = None) -> str:
+        """
+        Generate a summary of the video
+
+        Long transcripts are split into token-budgeted chunks that are
+        summarized concurrently and then merged, so videos longer than the
+        model context still summarize.
+
+        Args:
+            video_id (str): YouTube video ID
+            max_parallelism (int): Maximum concurrent chunk summaries
+            progress_callback: Called as (stage, completed, total) while chunks finish
+
+        Returns:
+            str: The summary text
+        """
         try:
             transcript = self.get_transcript(video_id)
             if not transcript:
                 return None
 
-            # Combine all transcript text
-            full_text = " ".join([entry['text'] for entry in transcript])
-            
-            # Generate summary using Gemini
-            # prompt = f"Please provide a concise summary of this video transcript:\n\n{full_text}"
-            # response = model.generate_content(prompt)
-
-            from together import Together
-
-            client = Together()
-            prompt = f"Please provide a concise summary of this video transcript:\n\n{full_text}"
-            response = client.chat.completions.create(
-                model="meta-llama/Llama-3.3-70B-Instruct-Turbo-Free",
-                messages=[{"role": "user", "content": prompt}],
+            summarizer = MapReduceSummarizer(
+                self._complete,
+                chunk_tokens=SUMMARY_CHUNK_TOKENS,
+                max_parallelism=max_parallelism,
+                progress_callback=progress_callback
             )
-            return response.choices[0].message.content
+            return summarizer.summarize(list(transcript.texts()))
         except Exception as e:
             print(f"Error generating summary: {str(e)}")
             return None
 
-    def search_transcript(self, video_id: str, query: str) -> List[Dict]:
-        """Search transcript for relevant segments using Gemini"""
+    def stream_summary(self, video_id: str, max_parallelism: int = SUMMARY_MAX_PARALLELISM,
+                       progress_callback: Optional[Callable[[str, int, int], None]] = None) -> Iterator[str]:
+        """
+        Yield the video summary as it is generated
+
+        Chunk summaries for long videos are produced first; the final summary
+        is then streamed token by token. Errors propagate to the caller.
+        """
+        transcript = self.get_transcript(video_id)
+        if not transcript:
+            return
+
+        summarizer = MapReduceSummarizer(
+            self._complete,
+            chunk_tokens=SUMMARY_CHUNK_TOKENS,
+            max_parallelism=max_parallelism,
+            progress_callback=progress_callback
+        )
+        prompt = summarizer.final_prompt(list(transcript.texts()))
+        stream = self._get_together_client().chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def get_index(self, video_id: str) -> Optional[TranscriptIndex]:
+        """Return the search index for a video, building it once per video"""
+        index = self.cache.get(video_id, 'index')
+        if index is not None:
+            return index
+
+        transcript = self.get_transcript(video_id)
+        if not transcript:
+            return None
+
+        index = TranscriptIndex(transcript, embed_fn=embed_texts)
+        self.cache.set(video_id, 'index', index)
+        return index
+
+    def search_transcript(self, video_id: str, query: str, top_k: int = 5,
+                          rerank: bool = False) -> List[Dict]:
+        """
+        Search transcript for relevant segments
+
+        Args:
+            video_id (str): YouTube video ID
+            query (str): Question or keywords to search for
+            top_k (int): Maximum number of segments to return
+            rerank (bool): Send the local candidates to Gemini for reranking
+
+        Returns:
+            List[Dict]: Matching segments with timestamp, text, start, duration and url
+        """
         try:
-            transcript = self.get_transcript(video_id)
-            if not transcript:
+            index = self.get_index(video_id)
+            if not index:
                 return None
 
-            # Create context for Gemini
-            context = "This is a YouTube video transcript with timestamps. "
-            context += "Find the most relevant segments that answer this question. Doesnt have to be exact but make sure it's relevant in semantic meaning and context: "
-            context += f"'{query}'\n\n"
-            
-            # Add transcript segments
-            for entry in transcript:
-                context += f"{entry['timestamp']}: {entry['text']}\n"
+            if not rerank:
+                return [self._format_segment(video_id, segment) for segment in index.search(query, top_k)]
 
-            prompt = context + "\nPlease identify and return the most relevant timestamps and their text that answer the query. Format your response as: [MM:SS] Text content"
-            
-            response = model.generate_content(prompt)
-            
-            # Process and format the response
-            relevant_segments = []
-            for line in response.text.split('\n'):
-                if '[' in line and ']' in line:  # Check if line contains timestamp
-                    # Find matching original transcript entry for additional metadata
-                    timestamp = line[line.find('['): line.find(']')+1]
-                    for entry in transcript:
-                        if entry['timestamp'] == timestamp:
-                            # Create YouTube timestamp URL
-                            time_seconds = int(entry['start'])
-                            youtube_url = f"https://youtube.com/watch?v={video_id}&t={time_seconds}"
-                            
-                            relevant_segments.append({
-                                'timestamp': timestamp,
-                                'text': line[line.find(']')+1:].strip(),
-                                'start': entry['start'],
-                                'duration': entry['duration'],
-                                'url': youtube_url
-                            })
-                            break
-
-            return relevant_segments
+            # Only the best local candidates go to the LLM, not the whole transcript
+            candidates = index.search(query, top_k * RERANK_CANDIDATE_FACTOR)
+            if not candidates:
+                return []
+
+            response = model.generate_content(self._rerank_prompt(query, candidates, top_k))
+            return list(self._map_response_lines(video_id, index, response.text.split('\n'), top_k))
         except Exception as e:
             print(f"Error searching transcript: {str(e)}")
             return None
 
-    def save_transcript(self, video_id: str, output_dir: str = "transcripts") -> str:
+    def stream_search(self, video_id: str, query: str, top_k: int = 5,
+                      rerank: bool = True) -> Iterator[Dict]:
+        """
+        Yield relevant segments as soon as each one is known
+
+        With rerank, Gemini's response is streamed and each segment is
+        yielded as soon as its response line is complete. Errors propagate to
+        the caller so a streaming client can be told about them.
+        """
+        index = self.get_index(video_id)
+        if not index:
+            return
+
+        if not rerank:
+            for segment in index.search(query, top_k):
+                yield self._format_segment(video_id, segment)
+            return
+
+        candidates = index.search(query, top_k * RERANK_CANDIDATE_FACTOR)
+        if not candidates:
+            return
+
+        response = model.generate_content(self._rerank_prompt(query, candidates, top_k), stream=True)
+        lines = iter_lines(chunk.text for chunk in response)
+        yield from self._map_response_lines(video_id, index, lines, top_k)
+
+    def _rerank_prompt(self, query: str, candidates: List[Dict], top_k: int) -> str:
+        """Build the Gemini prompt asking to rerank candidate segments"""
+        context = "These are candidate segments from a YouTube video transcript with timestamps. "
+        context += "Find the most relevant segments that answer this question. Doesnt have to be exact but make sure it's relevant in semantic meaning and context: "
+        context += f"'{query}'\n\n"
+        for segment in candidates:
+            context += f"{format_timestamp(segment['start'])}: {segment['text']}\n"
+
+        return context + f"\nPlease return at most {top_k} of the most relevant timestamps and their text, most relevant first. Format your response as: [MM:SS] Text content (or [H:MM:SS] past the first hour)"
+
+    def _map_response_lines(self, video_id: str, index: TranscriptIndex,
+                            lines: Iterable[str], top_k: int) -> Iterator[Dict]:
+        """Map LLM response lines back to transcript segments, one result per line"""
+        # Each timestamp is located with a bisect over segment start times,
+        # tolerating near misses
+        seen_starts = set()
+        found = 0
+        for line in lines:
+            parsed = parse_timestamp(line)
+            if not parsed:
+                continue
+            seconds, text_start = parsed
+            segment = index.segment_at(seconds)
+            if not segment or segment['start'] in seen_starts:
+                continue
+            seen_starts.add(segment['start'])
+            yield self._format_segment(video_id, segment, text=line[text_start:].strip(' :-'))
+            found += 1
+            if found >= top_k:
+                break
+
+    def _format_segment(self, video_id: str, segment: Dict, text: Optional[str] = None) -> Dict:
+        """Shape an index segment like a search result, with a YouTube timestamp URL"""
+        time_seconds = int(segment['start'])
+        return {
+            'timestamp': format_timestamp(segment['start']),
+            'text': text if text is not None else segment['text'],
+            'start': segment['start'],
+            'duration': segment['end'] - segment['start'],
+            'url': f"https://youtube.com/watch?v={video_id}&t={time_seconds}"
+        }
+
+    def save_transcript(self, video_id: str, output_dir: str = "transcripts",
+                        video_info: Optional[dict] = None, export_text: bool = True) -> str:
         """
-        Save the video transcript to a text file
+        Save the video transcript to the transcript store, optionally exporting a text file
         
         Args:
             video_id (str): YouTube video ID
             output_dir (str): Directory to save transcript files (default: 'transcripts')
+            video_info (dict, optional): Already-fetched video info; looked up if omitted
+            export_text (bool): Also write a human-readable .txt file
             
         Returns:
-            str: Path to the saved transcript file
+            str: Path to the saved transcript file, or the store directory without text export
         """
         try:
+            # get_transcript writes fetched transcripts through to the store
+            transcript = self.get_transcript(video_id)
+            if not transcript:
+                return None
+            if not export_text:
+                return self.store.directory
+
             # Create transcripts directory if it doesn't exist
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
+            os.makedirs(output_dir, exist_ok=True)
             
             # Get video info for the filename
-            video_info = self.get_video_info(video_id)
+            video_info = video_info or self.get_video_info(video_id)
             title = video_info['title']
             # Clean title for filename
             clean_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
             
-            # Get transcript
-            transcript = self.get_transcript(video_id)
-            if not transcript:
-                return None
-                
             # Create filename with video ID and clean title
             filename = f"{clean_title}_{video_id}.txt"
             filepath = os.path.join(output_dir, filename)
@@ -256,7 +524,10 @@ def main():
     
     # Get and display summary
     print("\nGenerating video summary...")
-    summary = yt.get_summary(video_id)
+    summary = yt.get_summary(
+        video_id,
+        progress_callback=lambda stage, done, total: print(f"  {stage}: {done}/{total}")
+    )
     if summary:
         print("\nVideo Summary:")
         print(summary)
@@ -1,11 +1,60 @@
-from flask import Flask, request, jsonify
-from yt_api import YouTubeProcessor
+from flask import Flask, request, jsonify, Response, stream_with_context
+from contextlib import contextmanager
+from queue import Empty, Queue
+import json
+import os
+import threading
+from yt_api import YouTubeProcessor, default_video_cache
+from transcript_store import TranscriptStore
+from singleflight import SingleFlight
+from text_utils import normalize_query
 
 app = Flask(__name__)
 
-# Hardcoded video URL from your yt_api.py
+# Default video when a request does not pass video_url
 VIDEO_URL = "https://www.youtube.com/watch?v=3f8dv72Ex6U&ab_channel=JamesHoffmann"
 
+# Processors are built once at startup: building the discovery client is a
+# network round-trip. Each processor's API client is used by one request at
+# a time, while transcripts, metadata and search indexes live in one
+# thread-safe cache and transcript store shared by the whole pool.
+POOL_SIZE = int(os.getenv('YT_PROCESSOR_POOL_SIZE', '4'))
+# Seconds a request waits for a free processor before giving up
+CHECKOUT_TIMEOUT = float(os.getenv('YT_PROCESSOR_CHECKOUT_TIMEOUT', '30'))
+shared_store = TranscriptStore(os.getenv('TRANSCRIPT_STORE_DIR', 'transcript_store'))
+shared_cache = default_video_cache(shared_store)
+processor_pool = Queue()
+for _ in range(POOL_SIZE):
+    processor_pool.put(YouTubeProcessor(cache=shared_cache, store=shared_store))
+
+
+@contextmanager
+def checkout_processor():
+    """Borrow a warm processor from the pool for the duration of a request"""
+    try:
+        yt_processor = processor_pool.get(timeout=CHECKOUT_TIMEOUT)
+    except Empty:
+        raise TimeoutError("No YouTube processor available, try again later")
+    try:
+        yield yt_processor
+    finally:
+        processor_pool.put(yt_processor)
+
+
+# Concurrent identical questions about the same video share one search, and
+# the result is held briefly for requests arriving right after it completes
+search_flight = SingleFlight(result_ttl=float(os.getenv('SEARCH_RESULT_TTL', '30')))
+
+
+def search_transcript(video_id: str, query: str, rerank: bool = False):
+    """Search a video's transcript, coalescing duplicate in-flight queries"""
+    def run():
+        with checkout_processor() as yt_processor:
+            return yt_processor.search_transcript(video_id, query, rerank=rerank)
+
+    return search_flight.do((video_id, normalize_query(query), rerank), run)
+
+
 @app.route('/api/video/links', methods=['POST'])
 def get_video_links():
     try:
@@ -18,11 +67,8 @@ def get_video_links():
                 "message": "Missing required parameter: query"
             }), 400
 
-        # Initialize YouTubeProcessor only when needed
-        yt_processor = YouTubeProcessor()
-            
-        # Extract video ID from hardcoded URL
-        video_id = yt_processor.extract_video_id(VIDEO_URL)
+        # Extract video ID from the requested URL, falling back to the default video
+        video_id = YouTubeProcessor.extract_video_id(data.get('video_url') or VIDEO_URL)
         if not video_id:
             return jsonify({
                 "status": "error",
@@ -30,7 +76,7 @@ def get_video_links():
             }), 400
 
         # Search transcript
-        results = yt_processor.search_transcript(video_id, data['query'])
+        results = search_transcript(video_id, data['query'], rerank=bool(data.get('rerank', False)))
         if not results:
             return jsonify({
                 "status": "error",
@@ -46,6 +92,11 @@ def get_video_links():
             } for segment in results]
         })
 
+    except TimeoutError as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 503
     except Exception as e:
         print(f"Error: {str(e)}")  # Add this for debugging
         return jsonify({
@@ -53,5 +104,114 @@ def get_video_links():
             "message": f"Server error: {str(e)}"
         }), 500
 
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class ClientDisconnected(Exception):
+    """Raised by emit once the SSE client has gone away"""
+
+
+def stream_events(produce):
+    """
+    Run produce(emit) on a worker thread and relay what it emits as SSE
+
+    Using a thread lets blocking work (such as the map step of a long
+    summary) report progress while the response is already open. Once the
+    client disconnects, the next emit raises ClientDisconnected so the
+    producer stops and releases its pooled processor.
+    """
+    events = Queue()
+    disconnected = threading.Event()
+
+    def emit(event, data):
+        if disconnected.is_set():
+            raise ClientDisconnected()
+        events.put((event, data))
+
+    def run():
+        try:
+            produce(emit)
+            events.put(("done", {}))
+        except ClientDisconnected:
+            pass
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            events.put(("error", {"message": f"Server error: {str(e)}"}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    def generate():
+        try:
+            while True:
+                item = events.get()
+                if item is None:
+                    break
+                yield sse_event(*item)
+        finally:
+            # Also reached on GeneratorExit when the client disconnects
+            disconnected.set()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/video/links/stream', methods=['POST'])
+def stream_video_links():
+    """Stream matching segments as SSE 'segment' events, ending with 'done'"""
+    data = request.get_json()
+    if not data or 'query' not in data:
+        return jsonify({
+            "status": "error",
+            "message": "Missing required parameter: query"
+        }), 400
+
+    video_id = YouTubeProcessor.extract_video_id(data.get('video_url') or VIDEO_URL)
+    if not video_id:
+        return jsonify({
+            "status": "error",
+            "message": "Invalid YouTube URL"
+        }), 400
+
+    def produce(emit):
+        # Same rerank default as /api/video/links; each reranked segment is
+        # sent as soon as its response line completes, and errors reach the
+        # client as an 'error' event
+        with checkout_processor() as yt_processor:
+            for segment in yt_processor.stream_search(video_id, data['query'],
+                                                      rerank=bool(data.get('rerank', False))):
+                emit("segment", {
+                    "timestamp": segment['timestamp'],
+                    "url": segment['url']
+                })
+
+    return stream_events(produce)
+
+
+@app.route('/api/video/summary/stream', methods=['POST'])
+def stream_video_summary():
+    """Stream the summary as SSE 'progress' and 'token' events, ending with 'done'"""
+    data = request.get_json(silent=True) or {}
+    video_id = YouTubeProcessor.extract_video_id(data.get('video_url') or VIDEO_URL)
+    if not video_id:
+        return jsonify({
+            "status": "error",
+            "message": "Invalid YouTube URL"
+        }), 400
+
+    def produce(emit):
+        def on_progress(stage, completed, total):
+            emit("progress", {"stage": stage, "completed": completed, "total": total})
+
+        with checkout_processor() as yt_processor:
+            for text in yt_processor.stream_summary(video_id, progress_callback=on_progress):
+                emit("token", {"text": text})
+
+    return stream_events(produce)
+
+
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=8000, debug=False, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,62 @@
+import base64
+import os
+import sys
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from image_cache import PerceptualCache, hamming_distance  # noqa: E402
+from image_preprocess import preprocess_image  # noqa: E402
+
+
+def product_page(product: int, cursor=None) -> Image.Image:
+    """A shop product page: same header, gallery, title, price and buy box layout for every product"""
+    image = Image.new('RGB', (1280, 800), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 1280, 60), fill=(35, 47, 62))
+    draw.rectangle((300, 10, 900, 50), fill='white')
+    draw.rectangle((0, 60, 1280, 90), fill=(55, 71, 90))
+    draw.rectangle((60, 130, 560, 630), fill=(245, 245, 245))
+    if product == 1:
+        draw.rectangle((250, 180, 370, 580), fill=(40, 40, 40))
+        title, bullets = (520, 430, 300), (330, 250, 300, 200, 340, 280, 220, 310)
+    else:
+        draw.ellipse((180, 250, 440, 510), fill=(40, 40, 40))
+        title, bullets = (380, 540, 460), (220, 340, 260, 330, 200, 300, 340, 240)
+    for i, width in enumerate(title):
+        draw.rectangle((620, 140 + i * 30, 620 + width, 160 + i * 30), fill=(20, 20, 20))
+    draw.rectangle((620, 260, 760, 290), fill=(177, 39, 4))
+    draw.rectangle((1000, 140, 1240, 420), outline=(200, 200, 200), width=2)
+    draw.rectangle((1020, 360, 1220, 395), fill=(255, 216, 20))
+    for i, width in enumerate(bullets):
+        draw.rectangle((620, 320 + i * 22, 620 + width, 332 + i * 22), fill=(60, 60, 60))
+    if cursor:
+        draw.polygon([(cursor, cursor), (cursor + 12, cursor + 30), (cursor + 20, cursor + 20)], fill='black')
+    return image
+
+
+def screenshot_hash(image: Image.Image, image_format: str = 'PNG') -> int:
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, quality=70)
+    encoded = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    return preprocess_image(encoded, Image.MIME[image_format])['image_hash']
+
+
+def test_same_layout_pages_of_different_products_do_not_match():
+    first, second = screenshot_hash(product_page(1)), screenshot_hash(product_page(2))
+    cache = PerceptualCache()
+    cache.put(first, {'product_name': 'Water Bottle'})
+
+    assert hamming_distance(first, second) > cache.max_distance
+    assert cache.get(second) is None
+
+
+def test_recaptured_page_matches():
+    original = screenshot_hash(product_page(1))
+    recaptured = screenshot_hash(product_page(1, cursor=700), image_format='JPEG')
+    cache = PerceptualCache()
+    cache.put(original, {'product_name': 'Water Bottle'})
+
+    assert cache.get(recaptured) == {'product_name': 'Water Bottle'}
@@ -0,0 +1,100 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from vector_store import IVFIndex, LocalVectorStore, VectorStore, reciprocal_rank_fusion  # noqa: E402
+
+
+def unit_rows(rng, rows, dim):
+    vectors = rng.normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def clustered_rows(rng, clusters, per_cluster, dim):
+    centers = unit_rows(rng, clusters, dim)
+    vectors = np.repeat(centers, per_cluster, axis=0) + 0.05 * rng.normal(size=(clusters * per_cluster, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_vector_store_is_abstract():
+    with pytest.raises(TypeError):
+        VectorStore()
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['b', 'c', 'd']], k=60)
+    assert [key for key, _ in fused] == ['b', 'c', 'a', 'd']
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_add_search_and_reopen(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = unit_rows(rng, 6, 8)
+    store = LocalVectorStore(str(tmp_path))
+    texts = [f"review {i}" for i in range(6)]
+    hashes = [f"h{i}" for i in range(6)]
+
+    assert store.add("AuraGlow Sleep Mask", texts[:3], hashes[:3], vectors[:3]) == 3
+    assert store.add("Other Mask", texts[3:], hashes[3:], vectors[3:]) == 3
+    # Known (product, hash) keys are skipped, matched on the normalized product name
+    assert store.add("auraglow sleep-mask", texts[:1], hashes[:1], vectors[:1]) == 0
+    assert store.missing("AURAGLOW Sleep Mask", ["h0", "h9"]) == [1]
+
+    best = store.search(vectors[4], k=1)[0]
+    assert best['chunk_hash'] == "h4"
+    assert best['score'] == pytest.approx(1.0, abs=1e-5)
+    filtered = store.search(vectors[4], k=3, product_name="auraglow  sleep mask")
+    assert {row['chunk_hash'] for row in filtered} == {"h0", "h1", "h2"}
+
+    reopened = LocalVectorStore(str(tmp_path))
+    assert len(reopened) == 6
+    assert reopened.search(vectors[4], k=6) == store.search(vectors[4], k=6)
+    assert reopened.missing("Other Mask", hashes[3:]) == []
+
+
+def test_hybrid_search_sees_rows_added_after_first_query(tmp_path):
+    rng = np.random.default_rng(1)
+    store = LocalVectorStore(str(tmp_path))
+    store.add("Mask", ["soft fabric", "tight strap"], ["h0", "h1"], unit_rows(rng, 2, 8))
+    query = unit_rows(rng, 1, 8)[0]
+    store.hybrid_search("battery life", query, k=2)
+
+    store.add("Speaker", ["long battery life"], ["h2"], unit_rows(rng, 1, 8))
+    hashes = [row['chunk_hash'] for row in store.hybrid_search("battery life", query, k=3)]
+    assert "h2" in hashes
+    assert hashes == [row['chunk_hash'] for row in
+                      LocalVectorStore(str(tmp_path)).hybrid_search("battery life", query, k=3)]
+
+
+def test_ivf_candidates_contain_nearest_rows():
+    rng = np.random.default_rng(2)
+    matrix = clustered_rows(rng, clusters=16, per_cluster=64, dim=16)
+    index = IVFIndex(matrix, n_lists=16, probes=2, seed=0)
+
+    assert sorted(row for rows in index.lists for row in rows) == list(range(len(matrix)))
+    for row in (0, 100, 500, 1000):
+        candidates = index.candidates(matrix[row])
+        assert row in candidates
+        assert len(candidates) < len(matrix)
+
+    # Same seed, same index
+    again = IVFIndex(matrix, n_lists=16, probes=2, seed=0)
+    assert np.array_equal(again.candidates(matrix[100]), index.candidates(matrix[100]))
+
+
+def test_ann_search_matches_exact_search(tmp_path):
+    rng = np.random.default_rng(3)
+    matrix = clustered_rows(rng, clusters=8, per_cluster=32, dim=16)
+    hashes = [f"h{i}" for i in range(len(matrix))]
+    exact = LocalVectorStore(str(tmp_path / "exact"))
+    ann = LocalVectorStore(str(tmp_path / "ann"), ann=True, ann_min_rows=100, ann_probes=2)
+    for store in (exact, ann):
+        store.add("Mask", hashes, hashes, matrix)
+
+    for row in (5, 77, 200):
+        assert ann.search(matrix[row], k=1)[0]['chunk_hash'] == f"h{row}"
+        assert ann.search(matrix[row], k=1) == exact.search(matrix[row], k=1)